@@ -1,9 +1,9 @@
 # app/crud.py
 from datetime import datetime, date
 from typing import Optional, Union, List
-from sqlalchemy.orm import Session, aliased, joinedload
+from sqlalchemy.orm import Session, aliased, joinedload, selectinload
 import re
-from sqlalchemy import func, union_all, literal_column, case, and_ ,or_
+from sqlalchemy import func, union_all, literal_column, case, and_ ,or_, inspect, select, update, insert
 from app import models, schemas
 from app.schemas import (
     UserCreate, UserPasswordChange, LeadCreate, LeadUpdateWeb, EventCreate,
@@ -21,6 +21,11 @@ from app.models import (
 )
 import secrets
 import string
+from app.temp_store import ContextStore
+
+# Mapped column attribute names on Lead, used to filter parsed update payloads
+# with a set lookup instead of probing the instrumented class with hasattr().
+LEAD_COLUMN_NAMES = frozenset(inspect(models.Lead).column_attrs.keys())
 
 def get_master_data_by_category(db: Session, category: str):
     return db.query(models.MasterData).filter(models.MasterData.category == category, models.MasterData.is_active == True).order_by(models.MasterData.value).all()
@@ -56,13 +61,44 @@ def create_user(db: Session, user: UserCreate):
     return db_user
 
 def get_user_by_id(db: Session, user_id: int):
-    return db.query(models.User).filter(models.User.id == user_id).first()
+    # db.get() is answered from the session's identity map when the row is already loaded.
+    return db.get(models.User, user_id)
 
 def get_users(db: Session):
     return db.query(models.User).order_by(models.User.username).all()
 
+# Per-session memo of name lookups -> user id, kept in Session.info so it lives exactly as
+# long as the request or message that opened the session. Handlers resolve the same
+# assignee or sender several times while handling one message.
+_USER_IDS_BY_NAME = "user_ids_by_name"
+
+def _cached_user(db: Session, key, matches):
+    user_id = db.info.get(_USER_IDS_BY_NAME, {}).get(key)
+    if user_id is None:
+        return None
+    user = db.get(User, user_id)
+    # Re-checked so a deleted or renamed user falls through to the query.
+    if user is not None and matches(user):
+        return user
+    return None
+
+def _remember_user(db: Session, key, user):
+    if user is not None:
+        db.info.setdefault(_USER_IDS_BY_NAME, {})[key] = user.id
+    return user
+
 def get_user_by_username(db: Session, username: str):
-    return db.query(models.User).filter(models.User.username == username).first()
+    key = ("username", username)
+    user = _cached_user(db, key, lambda u: u.username == username)
+    if user is not None:
+        return user
+    return _remember_user(db, key, db.query(models.User).filter(models.User.username == username).first())
+
+# Maps (tenant engine, sanitized phone) -> user id. The same few senders are looked
+# up on every message; with the id cached, db.get() is usually served from the
+# session's identity map (the router already loaded the sender) with no query.
+USER_PHONE_CACHE_TTL_SECONDS = 300
+_user_id_by_phone = ContextStore(maxsize=1024, ttl=USER_PHONE_CACHE_TTL_SECONDS)
 
 def get_user_by_phone(db: Session, phone: Union[str, int]):
     if not phone:
@@ -74,7 +110,19 @@ def get_user_by_phone(db: Session, phone: Union[str, int]):
         possible_formats.add(f"+{sanitized_phone}")
     if len(sanitized_phone) > 10:
         possible_formats.add(sanitized_phone[-10:])
-    return db.query(User).filter(User.usernumber.in_(list(possible_formats))).first()
+
+    cache_key = (db.get_bind(), sanitized_phone)
+    user_id = _user_id_by_phone.get(cache_key)
+    if user_id is not None:
+        user = db.get(User, user_id)
+        # Re-checked so a deleted user or a changed number falls through to the query.
+        if user is not None and user.usernumber in possible_formats:
+            return user
+
+    user = db.query(User).filter(User.usernumber.in_(list(possible_formats))).first()
+    if user is not None:
+        _user_id_by_phone[cache_key] = user.id
+    return user
 
 def verify_user(db: Session, username: str, password: str) -> Optional[models.User]:
     user = get_user_by_username(db, username)
@@ -97,6 +145,7 @@ def update_user(db: Session, user_id: int, user_data: schemas.UserUpdate) -> Opt
     for key, value in update_data.items():
         setattr(db_user, key, value)
     db.commit()
+    _user_id_by_phone.clear()
     db.refresh(db_user)
     return db_user
 
@@ -105,25 +154,64 @@ def delete_user(db: Session, user_id: int) -> bool:
     if not db_user: return False
     db.delete(db_user)
     db.commit()
+    _user_id_by_phone.clear()
     return True
 
 def get_user_by_name(db: Session, name):
     if not isinstance(name, str): return None
-    return db.query(User).filter(User.username.ilike(f"%{name.strip()}%")).first()
+    name = name.strip()
+    key = ("name", name.lower())
+    user = _cached_user(db, key, lambda u: name.lower() in u.username.lower())
+    if user is not None:
+        return user
+    # Exact match first: the default collation is case-insensitive, so this seeks the
+    # username index; the ilike substring match can't use it and only runs on a miss.
+    user = db.query(User).filter(User.username == name).first()
+    if user is None:
+        user = db.query(User).filter(User.username.ilike(f"%{name}%")).first()
+    return _remember_user(db, key, user)
+
+# LeadResponse serializes every lead's contacts and attachments; list queries load
+# both with one IN query each instead of two lazy loads per lead.
+_LEAD_RESPONSE_OPTIONS = (selectinload(models.Lead.contacts), selectinload(models.Lead.attachments))
 
 def get_all_leads(db: Session):
-    return db.query(models.Lead).filter(models.Lead.isActive == True, models.Lead.status != models.LeadStatus.PROPOSAL_SENT).order_by(models.Lead.created_at.desc()).all()
+    return db.query(models.Lead).options(*_LEAD_RESPONSE_OPTIONS).filter(models.Lead.isActive == True, models.Lead.status != models.LeadStatus.PROPOSAL_SENT).order_by(models.Lead.created_at.desc()).all()
 
 def get_deleted_leads(db: Session):
-    return db.query(models.Lead).filter(models.Lead.isActive == False).order_by(models.Lead.updated_at.desc()).all()
+    return db.query(models.Lead).options(*_LEAD_RESPONSE_OPTIONS).filter(models.Lead.isActive == False).order_by(models.Lead.updated_at.desc()).all()
 
 def get_lead_by_id(db: Session, lead_id: int):
-    return db.query(models.Lead).filter(models.Lead.id == lead_id).first()
-
-def get_lead_by_company(db: Session, company_name: str):
-    return db.query(models.Lead).filter(
-        func.lower(models.Lead.company_name).like(f"%{company_name.strip().lower()}%")
-    ).first()
+    return db.get(models.Lead, lead_id)
+
+def _first_by_company_name(query, company_name: str):
+    """
+    Tries an exact company_name match first, which can seek the company_name index
+    (SQL Server's default collation already compares case-insensitively), and only
+    falls back to the unindexable case-insensitive substring match on a miss.
+    """
+    name = company_name.strip()
+    match = query.filter(models.Lead.company_name == name).first()
+    if match is not None:
+        return match
+    return query.filter(func.lower(models.Lead.company_name).like(f"%{name.lower()}%")).first()
+
+def get_lead_by_company(db: Session, company_name: str, with_contacts: bool = False):
+    query = db.query(models.Lead)
+    if with_contacts:
+        query = query.options(selectinload(models.Lead.contacts))
+    return _first_by_company_name(query, company_name)
+
+def get_lead_with_assignee(db: Session, company_name: str):
+    """
+    Same lookup as get_lead_by_company, but also loads the assigned User in the
+    same query. Returns (lead, assignee); either may be None.
+    """
+    row = _first_by_company_name(
+        db.query(models.Lead, User).outerjoin(User, User.username == models.Lead.assigned_to),
+        company_name,
+    )
+    return (row[0], row[1]) if row else (None, None)
 
 def get_tasks_by_username(db: Session, username: str):
     user = get_user_by_username(db, username)
@@ -157,16 +245,13 @@ def get_lead_history(db: Session, lead_id: int) -> list[schemas.HistoryItemOut]:
     history.sort(key=lambda item: item.timestamp, reverse=True)
     return history
 
-def save_lead(db: Session, lead_data: schemas.LeadCreate) -> models.Lead:
-    assigned_user = get_user_by_name(db, lead_data.assigned_to)
-    if not assigned_user:
-        raise ValueError(f"Assigned user not found by name '{lead_data.assigned_to}'")
-
-    db_lead = models.Lead(
+def _build_lead(lead_data: schemas.LeadCreate, assigned_to: str) -> models.Lead:
+    """Builds an unsaved Lead with its contacts attached, so one flush inserts both."""
+    return models.Lead(
         company_name=lead_data.company_name,
         source=lead_data.source,
         created_by=lead_data.created_by,
-        assigned_to=assigned_user.username,
+        assigned_to=assigned_to,
         email=lead_data.email,
         website=lead_data.website,
         linkedIn=lead_data.linkedIn,
@@ -193,31 +278,51 @@ def save_lead(db: Session, lead_data: schemas.LeadCreate) -> models.Lead:
         amc=lead_data.amc,
         gst=lead_data.gst,
         company_pan=lead_data.company_pan,
-        created_at=datetime.now()
+        created_at=datetime.now(),
+        contacts=[
+            models.Contact(
+                contact_name=contact.contact_name,
+                phone=contact.phone,
+                email=contact.email,
+                designation=contact.designation,
+                linkedIn=contact.linkedIn,
+                pan=contact.pan
+            )
+            for contact in lead_data.contacts
+        ]
     )
 
+def save_lead(db: Session, lead_data: schemas.LeadCreate) -> models.Lead:
+    assigned_user = get_user_by_name(db, lead_data.assigned_to)
+    if not assigned_user:
+        raise ValueError(f"Assigned user not found by name '{lead_data.assigned_to}'")
+
+    db_lead = _build_lead(lead_data, assigned_user.username)
     db.add(db_lead)
     db.commit()
     db.refresh(db_lead)
 
-    for contact_pydantic in lead_data.contacts:
-        contact_dict = contact_pydantic.model_dump()
-
-        db_contact = models.Contact(
-            lead_id=db_lead.id,
-            contact_name=contact_dict.get('contact_name'),
-            phone=contact_dict.get('phone'),
-            email=contact_dict.get('email'),
-            designation=contact_dict.get('designation'),
-            linkedIn=contact_dict.get('linkedIn'),
-            pan=contact_dict.get('pan')
-        )
-        db.add(db_contact)
+    return db_lead
 
+def save_leads_bulk(db: Session, leads: List[tuple]) -> List[models.Lead]:
+    """
+    Saves many leads in one transaction. Each item is (LeadCreate, activity), where
+    activity is None or a (details, activity_type) pair logged against the new lead.
+    assigned_to must already be a valid username; the caller resolves it once per name.
+    The ORM groups the INSERTs per table into multi-row batches on flush.
+    """
+    db_leads = []
+    for lead_data, activity in leads:
+        db_lead = _build_lead(lead_data, lead_data.assigned_to)
+        if activity:
+            details, activity_type = activity
+            db_lead.activities.append(models.ActivityLog(
+                phase="new", details=details, activity_type=activity_type, created_at=datetime.utcnow()
+            ))
+        db_leads.append(db_lead)
+    db.add_all(db_leads)
     db.commit()
-    db.refresh(db_lead)
-
-    return db_lead
+    return db_leads
 
 def create_contact_for_lead(db: Session, lead_id: int, contact: schemas.ContactCreate) -> models.Contact:
     db_contact = models.Contact(**contact.model_dump(), lead_id=lead_id)
@@ -242,7 +347,7 @@ def update_lead(db: Session, lead_id: int, lead_data: schemas.LeadUpdateWeb):
     activity_type = update_data.pop("activity_type", "General")
 
     for key, value in update_data.items():
-        if hasattr(db_lead, key):
+        if key in LEAD_COLUMN_NAMES:
             setattr(db_lead, key, value)
 
     db_lead.updated_at = datetime.utcnow()
@@ -300,11 +405,16 @@ def restore_lead(db: Session, lead_id: int) -> Optional[models.Lead]:
         db.refresh(db_lead)
     return db_lead
 
-def update_lead_status(db: Session, lead_id: int, status: str, updated_by: str, remark: str = None):
-    lead = db.query(models.Lead).filter(models.Lead.id == lead_id).first()
-    if lead:
-        old_status = lead.status
-        lead.status = status
+def update_lead_status(db: Session, lead_id: int, status: str, updated_by: str, remark: str = None, commit: bool = True):
+    """
+    Sets a lead's status with a single UPDATE rather than loading the Lead, and
+    logs the change. Returns the previous status, or None if the lead does not exist.
+    Leads already loaded in the session are kept in sync by the ORM-enabled update.
+    """
+    row = db.execute(select(models.Lead.status).where(models.Lead.id == lead_id)).first()
+    if row:
+        old_status = row.status
+        db.execute(update(models.Lead).where(models.Lead.id == lead_id).values(status=status))
 
         activity_details = f"Status changed from '{old_status}' to '{status}' by {updated_by}."
 
@@ -312,11 +422,12 @@ def update_lead_status(db: Session, lead_id: int, status: str, updated_by: str,
             activity_details += f"\nNote: {remark}"
 
         create_activity_log(db, schemas.ActivityLogCreate(
-            lead_id=lead.id,
+            lead_id=lead_id,
             phase=status,
             details=activity_details,
-        ))
-    return lead
+        ), commit=commit)
+        return old_status
+    return None
 
 def create_event(db: Session, event: schemas.EventCreate):
     db_event = models.Event(
@@ -345,7 +456,7 @@ def complete_meeting(db: Session, meeting_id: int, notes: str, updated_by: str)
     event.remark = notes
     # Update status based on parent
     if event.lead_id:
-        update_lead_status(db, lead_id=event.lead_id, status="Meeting Done", updated_by=updated_by, remark=notes)
+        update_lead_status(db, lead_id=event.lead_id, status="Meeting Done", updated_by=updated_by, remark=notes, commit=False)
     elif event.proposal_id:
         # You may need a function to update proposal status
         pass
@@ -359,7 +470,7 @@ def complete_demo(db: Session, demo_id: int, notes: str, updated_by: str) -> Opt
     demo.phase = "Done"
     demo.remark = notes
     if demo.lead_id:
-        update_lead_status(db, lead_id=demo.lead_id, status="Demo Done", updated_by=updated_by, remark=notes)
+        update_lead_status(db, lead_id=demo.lead_id, status="Demo Done", updated_by=updated_by, remark=notes, commit=False)
     elif demo.proposal_id:
         # You may need a function to update proposal status
         pass
@@ -367,7 +478,8 @@ def complete_demo(db: Session, demo_id: int, notes: str, updated_by: str) -> Opt
     db.refresh(demo)
     return demo
 
-def create_activity_log(db: Session, activity: schemas.ActivityLogCreate):
+def create_activity_log(db: Session, activity: schemas.ActivityLogCreate, commit: bool = True):
+    """Pass commit=False to leave the row pending so the caller can commit it with the rest of its writes."""
     db_activity = models.ActivityLog(
         lead_id=activity.lead_id,
         phase=activity.phase,
@@ -376,17 +488,34 @@ def create_activity_log(db: Session, activity: schemas.ActivityLogCreate):
         created_at=datetime.utcnow()
     )
     db.add(db_activity)
-    db.commit()
-    db.refresh(db_activity)
+    if commit:
+        db.commit()
+        db.refresh(db_activity)
     return db_activity
 
-def create_assignment_log(db: Session, log: schemas.AssignmentLogCreate):
+def create_assignment_log(db: Session, log: schemas.AssignmentLogCreate, commit: bool = True):
+    """Pass commit=False to leave the row pending so the caller can commit it with the rest of its writes."""
     db_log = models.AssignmentLog(lead_id=log.lead_id, assigned_to=log.assigned_to, assigned_by=log.assigned_by)
     db.add(db_log)
-    db.commit()
-    db.refresh(db_log)
+    if commit:
+        db.commit()
+        db.refresh(db_log)
     return db_log
 
+def create_assignment_and_activity(db: Session, lead_id: int, assigned_to: str, assigned_by: str, phase: str, details: str):
+    """
+    Writes the assignment log and its activity log row for a reassignment.
+    Both are plain INSERTs: neither id is read back, so the ORM's per-row
+    RETURNING/OUTPUT and identity-map bookkeeping are skipped. The caller commits.
+    """
+    now = datetime.utcnow()
+    db.execute(insert(AssignmentLog).values(
+        lead_id=lead_id, assigned_to=assigned_to, assigned_by=assigned_by, assigned_at=now
+    ))
+    db.execute(insert(ActivityLog).values(
+        lead_id=lead_id, phase=phase, details=details, activity_type="Call", created_at=now
+    ))
+
 def is_user_available(db: Session, username: str, user_phone: str, start_time: datetime, end_time: datetime, exclude_event_id: int = None, exclude_demo_id: int = None) -> Optional[Union[Event, Demo]]:
     meeting_conflict_query = db.query(models.Event).filter(
         models.Event.assigned_to == username,
@@ -590,7 +719,22 @@ def assign_drip_to_lead(db: Session, lead_id: int, drip_sequence_id: int) -> Lea
     return new_assignment
 
 def get_active_drip_assignments(db: Session) -> List[LeadDripAssignment]:
-    return db.query(LeadDripAssignment).filter(LeadDripAssignment.is_active == True).all()
+    """
+    The drip loop reads each assignment's lead, its contacts, and the sequence's
+    steps and messages, so they are loaded up front in a fixed number of queries
+    instead of several per assignment.
+    """
+    return (
+        db.query(LeadDripAssignment)
+        .options(
+            joinedload(LeadDripAssignment.lead).selectinload(Lead.contacts),
+            selectinload(LeadDripAssignment.drip_sequence)
+            .selectinload(models.DripSequence.steps)
+            .joinedload(DripSequenceStep.message),
+        )
+        .filter(LeadDripAssignment.is_active == True)
+        .all()
+    )
 
 def log_sent_drip_message(db: Session, assignment_id: int, step_id: int):
     log_entry = SentDripMessageLog(assignment_id=assignment_id, step_id=step_id)
@@ -842,7 +986,7 @@ def get_all_leads_with_last_activity(db: Session):
     results = db.query(
         Lead,
         latest_activity
-    ).outerjoin(
+    ).options(*_LEAD_RESPONSE_OPTIONS).outerjoin(
         latest_activity,
         (Lead.id == latest_activity.lead_id) & (latest_activity_subquery.c.row_num == 1)
     ).filter(Lead.isActive == True, Lead.status != models.LeadStatus.PROPOSAL_SENT).order_by(Lead.created_at.desc()).all()
@@ -1006,52 +1150,56 @@ def generate_user_performance_data(db: Session, user_id: int, start_date: date,
     start_datetime = datetime.combine(start_date, datetime.min.time())
     end_datetime = datetime.combine(end_date, datetime.max.time())
 
-    new_leads_assigned = db.query(models.Lead).filter(
-        models.Lead.assigned_to == user.username,
-        models.Lead.created_at.between(start_datetime, end_datetime)
-    ).count()
-
-    meetings_scheduled = db.query(models.Event).filter(
-        models.Event.assigned_to == user.username,
-        models.Event.event_type == 'Meeting',
-        models.Event.created_at.between(start_datetime, end_datetime)
-    ).count()
+    # Each table is read once, with the individual KPIs computed as conditional
+    # counts, instead of one COUNT query per KPI. This runs per user in the
+    # scheduled reports, so the round trips add up.
+    def in_range(column):
+        return column.between(start_datetime, end_datetime)
 
-    demos_scheduled = db.query(models.Demo).filter(
-        models.Demo.assigned_to == user.usernumber,
-        models.Demo.created_at.between(start_datetime, end_datetime)
-    ).count()
-
-    meetings_completed = db.query(models.Event).filter(
+    new_leads_assigned, leads_in_progress = db.query(
+        func.count(models.Lead.id),
+        func.count(case((models.Lead.status.notin_([models.LeadStatus.WON_DEAL_DONE.value, models.LeadStatus.LOST.value]), 1)))
+    ).filter(
+        models.Lead.assigned_to == user.username,
+        in_range(models.Lead.created_at)
+    ).one()
+
+    meeting_scheduled = and_(models.Event.event_type == 'Meeting', in_range(models.Event.created_at))
+    meeting_completed = and_(models.Event.phase == 'Done', in_range(models.Event.event_time))
+    meetings_scheduled, meetings_completed = db.query(
+        func.count(case((meeting_scheduled, 1))),
+        func.count(case((meeting_completed, 1)))
+    ).filter(
         models.Event.assigned_to == user.username,
-        models.Event.phase == 'Done',
-        models.Event.event_time.between(start_datetime, end_datetime)
-    ).count()
-
-    demos_completed = db.query(models.Demo).filter(
+        or_(meeting_scheduled, meeting_completed)
+    ).one()
+
+    demo_scheduled = in_range(models.Demo.created_at)
+    demo_completed = and_(models.Demo.phase == 'Done', in_range(models.Demo.start_time))
+    demos_scheduled, demos_completed = db.query(
+        func.count(case((demo_scheduled, 1))),
+        func.count(case((demo_completed, 1)))
+    ).filter(
         models.Demo.assigned_to == user.usernumber,
-        models.Demo.phase == 'Done',
-        models.Demo.start_time.between(start_datetime, end_datetime)
-    ).count()
+        or_(demo_scheduled, demo_completed)
+    ).one()
 
-    activities_logged = db.query(models.ActivityLog).join(models.Lead).filter(
+    activities_logged, lost_logs = db.query(
+        func.count(models.ActivityLog.id),
+        func.count(case((models.ActivityLog.details.like(f"%Status changed from%to '{models.LeadStatus.LOST.value}'%"), 1)))
+    ).join(models.Lead).filter(
         models.Lead.assigned_to == user.username,
-        models.ActivityLog.created_at.between(start_datetime, end_datetime)
-    ).count()
+        in_range(models.ActivityLog.created_at)
+    ).one()
 
-    won_logs = db.query(models.ActivityLog).join(models.Lead).filter(
+    # The lead comes back with each log so the table below doesn't lazy-load it per row.
+    won_logs = db.query(models.ActivityLog, models.Lead).join(models.Lead).filter(
         models.Lead.assigned_to == user.username,
         models.ActivityLog.details.like(f"%Status changed from%to '{models.LeadStatus.WON_DEAL_DONE.value}'%"),
-        models.ActivityLog.created_at.between(start_datetime, end_datetime)
+        in_range(models.ActivityLog.created_at)
     ).all()
     deals_won_count = len(won_logs)
 
-    lost_logs = db.query(models.ActivityLog).join(models.Lead).filter(
-        models.Lead.assigned_to == user.username,
-        models.ActivityLog.details.like(f"%Status changed from%to '{models.LeadStatus.LOST.value}'%"),
-        models.ActivityLog.created_at.between(start_datetime, end_datetime)
-    ).count()
-    
     conversion_rate = (deals_won_count / new_leads_assigned * 100) if new_leads_assigned > 0 else 0
 
     activity_volume_data = [
@@ -1062,12 +1210,6 @@ def generate_user_performance_data(db: Session, user_id: int, start_date: date,
         {"name": "Activities Logged", "value": activities_logged},
     ]
 
-    leads_in_progress = db.query(models.Lead).filter(
-        models.Lead.assigned_to == user.username,
-        models.Lead.status.notin_([models.LeadStatus.WON_DEAL_DONE.value, models.LeadStatus.LOST.value]),
-        models.Lead.created_at.between(start_datetime, end_datetime)
-    ).count()
-
     lead_outcome_data = [
         {"name": "Deals Won", "value": deals_won_count},
         {"name": "Leads Lost", "value": lost_logs},
@@ -1075,8 +1217,7 @@ def generate_user_performance_data(db: Session, user_id: int, start_date: date,
     ]
 
     deals_won_table_data = []
-    for log in won_logs:
-        lead = log.lead
+    for log, lead in won_logs:
         time_to_close = (log.created_at.date() - lead.created_at.date()).days
         deals_won_table_data.append({
             "client_name": lead.company_name,
@@ -1126,7 +1267,7 @@ def delete_lead_attachment(db: Session, attachment_id: int) -> bool:
 
 def get_all_proposals(db: Session) -> List[models.ProposalSent]:
     """Fetches all proposals from the database."""
-    return db.query(models.ProposalSent).order_by(models.ProposalSent.converted_at.desc()).all()
+    return db.query(models.ProposalSent).options(selectinload(models.ProposalSent.contacts)).order_by(models.ProposalSent.converted_at.desc()).all()
 
 # --- START: FIX ---
 def convert_lead_to_proposal(db: Session, lead_id: int, payload: schemas.ConvertToProposalPayload, converted_by: str) -> models.ProposalSent:
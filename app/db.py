@@ -13,6 +13,19 @@ load_dotenv()
 
 # This dictionary caches engine objects to improve performance.
 _engines = {}
+# One session factory per company, built alongside its engine.
+_session_factories = {}
+
+# Connection pool settings, shared by every company engine.
+# pool_pre_ping replaces connections the server or a firewall dropped while idle,
+# and pool_recycle retires them before they get that old.
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Compiled-statement cache per engine (SQLAlchemy's default is 500), sized so the
+# ORM and report queries across all handlers don't evict each other.
+QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", "1200"))
 
 # This map defines which environment variable holds the connection string for each company.
 # The key is the company_name the user will provide.
@@ -48,11 +61,20 @@ def get_engine(company_name: str):
     # 4. Create, cache, and return the new engine
     try:
         params = urllib.parse.quote_plus(conn_str)
-        engine = create_engine(f"mssql+pyodbc:///?odbc_connect={params}")
+        engine = create_engine(
+            f"mssql+pyodbc:///?odbc_connect={params}",
+            pool_size=POOL_SIZE,
+            max_overflow=MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT,
+            pool_recycle=POOL_RECYCLE,
+            pool_pre_ping=True,
+            query_cache_size=QUERY_CACHE_SIZE,
+        )
         # Test connection
         connection = engine.connect()
         connection.close()
         _engines[company_name] = engine
+        _session_factories[company_name] = sessionmaker(autocommit=False, autoflush=False, bind=engine)
         print(f"Successfully created and cached engine for company: {company_name}")
         return engine
     except Exception as e:
@@ -63,6 +85,13 @@ def get_engine(company_name: str):
 Base = declarative_base()
 
 
+def _get_session_factory(company_name: str):
+    """Returns the cached sessionmaker for a company, creating its engine on first use."""
+    if company_name not in _session_factories:
+        get_engine(company_name)
+    return _session_factories[company_name]
+
+
 def get_db(request: Request):
     """
     FastAPI dependency that provides a DB session based on the 'X-Company-Name' header.
@@ -77,9 +106,7 @@ def get_db(request: Request):
 
     db: Session = None
     try:
-        engine = get_engine(company_name)
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-        db = SessionLocal()
+        db = _get_session_factory(company_name)()
         yield db
     except (HTTPException, ValueError) as e:
         raise e
@@ -90,16 +117,16 @@ def get_db(request: Request):
             db.close()
 
 
-def get_db_session_for_company(company_name: str) -> Session:
+def get_db_session_for_company(company_name: str, expire_on_commit: bool = True) -> Session:
     """
     Creates a new database session for a specific company.
     This is used manually for login, registration, and the WhatsApp webhook.
     It's crucial to use this in a try/finally block to ensure the session is closed.
+    Batch loops that commit repeatedly while reading objects they loaded up front can
+    pass expire_on_commit=False so each commit doesn't force those rows to be re-fetched.
     """
     try:
-        engine = get_engine(company_name)
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-        return SessionLocal()
+        return _get_session_factory(company_name)(expire_on_commit=expire_on_commit)
     except (HTTPException, ValueError) as e:
         # Re-raise exceptions from get_engine to be handled by the caller
         raise e
@@ -1,7 +1,7 @@
 # gpt_parser.py
 import os
 import requests
-import json
+import orjson
 import re
 import logging
 from dotenv import load_dotenv
@@ -83,7 +83,7 @@ User Message:
         response = requests.post(
             "https://api.openai.com/v1/chat/completions",
             headers=headers,
-            json=payload,
+            data=orjson.dumps(payload),
             timeout=20
         )
 
@@ -91,12 +91,12 @@ User Message:
             logger.error("❌ GPT API error (%s): %s", response.status_code, response.text)
             return {}, f"❌ GPT API failed: {response.status_code}"
 
-        result_content = response.json()["choices"][0]["message"]["content"]
+        result_content = orjson.loads(response.content)["choices"][0]["message"]["content"]
         logger.info(f"🔍 Raw GPT Response: {result_content}")
 
         try:
-            data = json.loads(result_content)
-        except json.JSONDecodeError:
+            data = orjson.loads(result_content)
+        except orjson.JSONDecodeError:
             logger.error("❌ GPT returned invalid JSON")
             return {}, "❌ GPT returned invalid JSON"
 
@@ -188,7 +188,7 @@ User Message:
         response = requests.post(
             "https://api.openai.com/v1/chat/completions",
             headers=headers,
-            json=payload,
+            data=orjson.dumps(payload),
             timeout=20
         )
 
@@ -196,12 +196,12 @@ User Message:
             logger.error("❌ GPT API error (%s): %s", response.status_code, response.text)
             return {}, f"❌ GPT API failed: {response.status_code}"
 
-        result_content = response.json()["choices"][0]["message"]["content"]
+        result_content = orjson.loads(response.content)["choices"][0]["message"]["content"]
         logger.info(f"🔍 Raw GPT Response for optional fields: {result_content}")
 
         try:
-            data = json.loads(result_content)
-        except json.JSONDecodeError:
+            data = orjson.loads(result_content)
+        except orjson.JSONDecodeError:
             logger.error("❌ GPT returned invalid JSON")
             return {}, "❌ GPT returned invalid JSON"
 
@@ -262,17 +262,17 @@ User Message:
         response = requests.post(
             "https://api.openai.com/v1/chat/completions",
             headers=headers,
-            json=payload,
+            data=orjson.dumps(payload),
             timeout=20
         )
         if response.status_code != 200:
             logger.error("❌ GPT API error (%s): %s", response.status_code, response.text)
             return {}, f"❌ GPT API failed: {response.status_code}"
         
-        result_content = response.json()["choices"][0]["message"]["content"]
+        result_content = orjson.loads(response.content)["choices"][0]["message"]["content"]
         logger.info(f"🔍 Raw GPT Response for core update: {result_content}")
         
-        data = json.loads(result_content)
+        data = orjson.loads(result_content)
         
         # Filter to ensure only valid fields are returned
         core_fields = ["company_name", "contact_name", "phone", "email", "address", "phone_2"]
@@ -7,15 +7,19 @@ from dateparser.search import search_dates
 
 from app.crud import get_lead_by_company, create_activity_log, get_user_by_name, get_user_by_phone, create_reminder
 from app.schemas import ActivityLogCreate, ReminderCreate
-from app.message_sender import send_message, send_whatsapp_message
+from app.message_sender import send_message_async, send_whatsapp_message_async, send_in_background
 
 logger = logging.getLogger(__name__)
 
+_ADD_ACTIVITY_RE = re.compile(r"add activity for\s+(.+?),\s+(.+)", re.IGNORECASE)
+# Common trigger words for phrases that are LIKELY to contain a date.
+_DATE_TRIGGER_RE = re.compile(r'\b(on|at|in|next|tomorrow|today|by)\b', re.IGNORECASE)
+
 def parse_activity_message(msg_text: str):
     """
     Parses messages like "add activity for [Company Name], [Details]"
     """
-    match = re.search(r"add activity for\s+(.+?),\s+(.+)", msg_text, re.IGNORECASE)
+    match = _ADD_ACTIVITY_RE.search(msg_text)
     if match:
         company_name = match.group(1).strip()
         details = match.group(2).strip()
@@ -33,13 +37,13 @@ async def handle_add_activity(db: Session, msg_text: str, sender: str, reply_url
         if not company_name or not details:
             error_msg = "⚠️ Invalid format. Please use:\n`add activity for [Company Name], [your activity details]`"
             # Corrected: send_message arguments
-            return send_message(number=sender, message=error_msg, source=source)
+            return await send_message_async(number=sender, message=error_msg, source=source)
 
         lead = get_lead_by_company(db, company_name)
         if not lead:
             error_msg = f"❌ Could not find a lead for the company: '{company_name}'. Please check the name."
             # Corrected: send_message arguments
-            return send_message(number=sender, message=error_msg, source=source)
+            return await send_message_async(number=sender, message=error_msg, source=source)
 
         activity_data = ActivityLogCreate(
             lead_id=lead.id,
@@ -48,7 +52,7 @@ async def handle_add_activity(db: Session, msg_text: str, sender: str, reply_url
         )
         
         new_activity = create_activity_log(db, activity=activity_data)
-        logger.info(f"New activity (ID: {new_activity.id}) created for lead '{lead.company_name}' (ID: {lead.id})")
+        logger.info("New activity (ID: %s) created for lead '%s' (ID: %s)", new_activity.id, lead.company_name, lead.id)
         
         reminder_set = False
         remind_time = None
@@ -57,8 +61,7 @@ async def handle_add_activity(db: Session, msg_text: str, sender: str, reply_url
 
         # 1. Pre-filter using a regex to find phrases that are LIKELY to contain a date.
         # We look for common trigger words.
-        date_trigger_pattern = r'\b(on|at|in|next|tomorrow|today|by)\b'
-        match = re.search(date_trigger_pattern, details, re.IGNORECASE)
+        match = _DATE_TRIGGER_RE.search(details)
 
         # 2. ONLY if a trigger word is found, do we proceed to parse the date.
         if match:
@@ -90,7 +93,7 @@ async def handle_add_activity(db: Session, msg_text: str, sender: str, reply_url
                                 is_hidden_from_activity_log=False # User-generated reminder, should be visible
                             ))
                         
-                        logger.info(f"Scheduled reminder for activity on lead {lead.id} for assignee {assignee_user.username}")
+                        logger.info("Scheduled reminder for activity on lead %s for assignee %s", lead.id, assignee_user.username)
                         reminder_set = True
         # --- END CORRECTION ---
 
@@ -107,19 +110,19 @@ async def handle_add_activity(db: Session, msg_text: str, sender: str, reply_url
                     f"- Logged by {logged_by_info}"
                 )
                 # --- CRITICAL FIX: Corrected send_whatsapp_message call ---
-                send_whatsapp_message(number=assignee_user.usernumber, message=notification_msg)
-                logger.info(f"Sent activity notification to assignee {assignee_user.username}")
+                send_in_background(send_whatsapp_message_async(number=assignee_user.usernumber, message=notification_msg, dedupe=True))
+                logger.info("Sent activity notification to assignee %s", assignee_user.username)
 
         success_msg = f"✅ Activity logged successfully for *{lead.company_name}*."
         if reminder_set and remind_time:
             success_msg += f"\n\n⏰ Reminder has also been set for the assignee for {remind_time.strftime('%A, %b %d at %I:%M %p')}."
 
         # Corrected: send_message arguments
-        return send_message(number=sender, message=success_msg, source=source)
+        return await send_message_async(number=sender, message=success_msg, source=source)
 
     except Exception as e:
-        logger.error(f"Error creating activity log: {e}", exc_info=True)
+        logger.error("Error creating activity log: %s", e, exc_info=True)
         db.rollback()
         error_msg = "❌ An internal error occurred while logging the activity."
         # Corrected: send_message arguments
-        return send_message(number=sender, message=error_msg, source=source)
\ No newline at end of file
+        return await send_message_async(number=sender, message=error_msg, source=source)
\ No newline at end of file
@@ -7,7 +7,7 @@ import logging
 import pytz # Import the pytz library
 
 from app.models import Event, Lead, Demo, Feedback, Reminder, User
-from app.message_sender import send_message, format_phone, send_whatsapp_message
+from app.message_sender import send_message_async, format_phone, send_whatsapp_message_async, send_in_background
 from app.crud import get_user_by_phone, get_user_by_name, get_lead_by_company, update_lead_status, create_activity_log, is_user_available, create_reminder
 from app.schemas import ActivityLogCreate, ReminderCreate
 
@@ -20,12 +20,22 @@ LOCAL_TIMEZONE = pytz.timezone('Asia/Kolkata')
 UTC = pytz.utc
 # --- END: TIMEZONE CONFIGURATION ---
 
+_SCHEDULE_DEMO_RE = re.compile(
+    r"schedule\s+demo\s+(?:for|with)\s+(.+?)\s+(?:on|at)\s+(.+?)(?:\s+assigned\s+to\s+(.+))?$",
+    re.IGNORECASE
+)
+_DEMO_COMPANY_RE = re.compile(
+    r"(?:demo\s+done\s+for|reschedule\s+demo\s+for)\s+(.+?)(?:\.|,|\bthey\b|\bon\b|\bat\b|$)",
+    re.IGNORECASE
+)
+_DATE_PHRASE_RE = re.compile(r"(?:on|at)\s+(.+)", re.IGNORECASE)
+_ASSIGNED_TO_SPLIT_RE = re.compile(r'\s+assigned\s+to', re.IGNORECASE)
+_ASSIGN_TO_RE = re.compile(r"(?:assigned to|assign to)\s+([A-Za-z0-9\s]+)", re.IGNORECASE)
+_RESCHEDULE_DEMO_RE = re.compile(r"reschedule\s+demo\s+for\s+(.+?)\s+(?:on|at)\s+(.+)", re.IGNORECASE)
+
 def extract_details_for_demo(text: str):
     company_name, assigned_to, demo_time_str = None, None, None
-    match = re.search(
-        r"schedule\s+demo\s+(?:for|with)\s+(.+?)\s+(?:on|at)\s+(.+?)(?:\s+assigned\s+to\s+(.+))?$",
-        text, re.IGNORECASE
-    )
+    match = _SCHEDULE_DEMO_RE.search(text)
     if match:
         company_name = match.group(1).strip()
         demo_time_str = match.group(2).strip()
@@ -33,25 +43,21 @@ def extract_details_for_demo(text: str):
     return company_name, assigned_to, demo_time_str
 
 def extract_company_name(text: str) -> str:
-    match = re.search(
-        r"(?:demo\s+done\s+for|reschedule\s+demo\s+for)\s+(.+?)(?:\.|,|\bthey\b|\bon\b|\bat\b|$)",
-        text,
-        re.IGNORECASE
-    )
+    match = _DEMO_COMPANY_RE.search(text)
     return match.group(1).strip() if match else ""
 
 def extract_datetime(text: str) -> datetime:
-    date_match = re.search(r"(?:on|at)\s+(.+)", text, re.IGNORECASE)
+    date_match = _DATE_PHRASE_RE.search(text)
     if date_match:
         raw_date_string = date_match.group(1).strip()
-        raw_date_string = re.split(r'\s+assigned\s+to', raw_date_string, flags=re.IGNORECASE)[0]
+        raw_date_string = _ASSIGNED_TO_SPLIT_RE.split(raw_date_string)[0]
         parsed = dateparser.parse(raw_date_string, settings={"DATE_ORDER": "DMY", 'PREFER_DATES_FROM': 'future'})
         if parsed:
             return parsed
     return None
 
 def extract_assignee(text: str, db: Session):
-    match = re.search(r"(?:assigned to|assign to)\s+([A-Za-z0-9\s]+)", text, re.IGNORECASE)
+    match = _ASSIGN_TO_RE.search(text)
     if not match:
         return None
     assignee_raw = match.group(1).strip()
@@ -63,21 +69,21 @@ async def handle_demo_schedule(db: Session, message_text: str, sender_phone: str
         company_name, assigned_to_name, demo_time_str = extract_details_for_demo(message_text)
 
         if not company_name or not demo_time_str:
-            return send_message(number=sender_phone, message="⚠️ Invalid format. Use: `Schedule demo for [Company] on [Date]`", source=source)
+            return await send_message_async(number=sender_phone, message="⚠️ Invalid format. Use: `Schedule demo for [Company] on [Date]`", source=source)
 
         lead = get_lead_by_company(db, company_name)
         if not lead:
-            return send_message(number=sender_phone, message=f"❌ Could not find lead with company: {company_name}", source=source)
+            return await send_message_async(number=sender_phone, message=f"❌ Could not find lead with company: {company_name}", source=source)
         
         assignee_user = get_user_by_name(db, assigned_to_name) if assigned_to_name else get_user_by_name(db, lead.assigned_to)
         if not assignee_user:
             assignee_name_to_show = assigned_to_name or lead.assigned_to
-            return send_message(number=sender_phone, message=f"❌ Could not find an assignee named '{assignee_name_to_show}'.", source=source)
+            return await send_message_async(number=sender_phone, message=f"❌ Could not find an assignee named '{assignee_name_to_show}'.", source=source)
 
         # --- START: TIMEZONE-AWARE PARSING ---
         demo_dt_naive = dateparser.parse(demo_time_str, settings={'DATE_ORDER': 'DMY', 'PREFER_DATES_FROM': 'future'})
         if not demo_dt_naive:
-            return send_message(number=sender_phone, message=f"⚠️ Could not find a valid date/time in '{demo_time_str}'.", source=source)
+            return await send_message_async(number=sender_phone, message=f"⚠️ Could not find a valid date/time in '{demo_time_str}'.", source=source)
 
         demo_dt_local = LOCAL_TIMEZONE.localize(demo_dt_naive)
         demo_dt_utc = demo_dt_local.astimezone(UTC)
@@ -87,7 +93,7 @@ async def handle_demo_schedule(db: Session, message_text: str, sender_phone: str
         
         if start_time < datetime.utcnow():
             error_msg = f"❌ The start time you entered ({demo_dt_local.strftime('%d-%b-%Y %I:%M %p')}) is in the past. Please use a future date."
-            return send_message(number=sender_phone, message=error_msg, source=source)
+            return await send_message_async(number=sender_phone, message=error_msg, source=source)
 
         conflict = is_user_available(db, assignee_user.username, assignee_user.usernumber, start_time, end_time)
         if conflict:
@@ -102,7 +108,7 @@ async def handle_demo_schedule(db: Session, message_text: str, sender_phone: str
                 f"Conflict: {conflict_type} with *{conflict_lead_name}*\n"
                 f"Time: {conflict_start_local.strftime('%I:%M %p')}"
             )
-            return send_message(number=sender_phone, message=error_msg, source=source)
+            return await send_message_async(number=sender_phone, message=error_msg, source=source)
 
         sender_user = get_user_by_phone(db, sender_phone)
         sender_name = sender_user.username if sender_user else sender_phone
@@ -140,7 +146,7 @@ async def handle_demo_schedule(db: Session, message_text: str, sender_phone: str
                 is_hidden_from_activity_log=True
             ))
         
-        logger.info(f"Scheduled pre-demo reminders for demo ID {demo.id}")
+        logger.info("Scheduled pre-demo reminders for demo ID %s", demo.id)
 
         # --- START: CORRECTED NOTIFICATION LOGIC ---
         if assignee_user.usernumber and sender_phone != assignee_user.usernumber:
@@ -153,40 +159,40 @@ async def handle_demo_schedule(db: Session, message_text: str, sender_phone: str
                 f"👤 Contact: {contact_name_for_msg} ({contact_phone_for_msg})\n"
                 f"🕒 Time: {time_formatted_local}"
             )
-            send_whatsapp_message(number=format_phone(assignee_user.usernumber), message=notification_msg)
-            logger.info(f"Sent demo notification to {assignee_user.username} at {assignee_user.usernumber}")
+            send_in_background(send_whatsapp_message_async(number=format_phone(assignee_user.usernumber), message=notification_msg, dedupe=True))
+            logger.info("Sent demo notification to %s at %s", assignee_user.username, assignee_user.usernumber)
         # --- END: CORRECTED NOTIFICATION LOGIC ---
 
         confirmation_msg = f"✅ Demo scheduled for {company_name} on {time_formatted_local}\n👤 Assigned to: {assignee_user.username}. Reminders have been set."
         
-        return send_message(number=sender_phone, message=confirmation_msg, source=source)
+        return await send_message_async(number=sender_phone, message=confirmation_msg, source=source)
     
     except Exception as e:
         db.rollback()
-        logger.error(f"❌ Error scheduling demo: {e}", exc_info=True)
-        return send_message(number=sender_phone, message="❌ Failed to schedule demo due to an internal error.", source=source)
+        logger.error("❌ Error scheduling demo: %s", e, exc_info=True)
+        return await send_message_async(number=sender_phone, message="❌ Failed to schedule demo due to an internal error.", source=source)
 
 async def handle_demo_reschedule(db: Session, message_text: str, sender: str, reply_url: str, source: str = "whatsapp"):
     try:
-        reschedule_match = re.search(r"reschedule\s+demo\s+for\s+(.+?)\s+(?:on|at)\s+(.+)", message_text, re.IGNORECASE)
+        reschedule_match = _RESCHEDULE_DEMO_RE.search(message_text)
         if not reschedule_match:
-             return send_message(number=sender, message="⚠️ Invalid format. Use: `reschedule demo for [Company] on [Date]`", source=source)
+             return await send_message_async(number=sender, message="⚠️ Invalid format. Use: `reschedule demo for [Company] on [Date]`", source=source)
         
         company_name = reschedule_match.group(1).strip()
         new_time_str = reschedule_match.group(2).strip()
 
         lead = get_lead_by_company(db, company_name)
         if not lead:
-            return send_message(number=sender, message=f"❌ No lead found for company '{company_name}'.", source=source)
+            return await send_message_async(number=sender, message=f"❌ No lead found for company '{company_name}'.", source=source)
 
         demo = db.query(Demo).filter(Demo.lead_id == lead.id).order_by(Demo.start_time.desc()).first()
         if not demo:
-            return send_message(number=sender, message=f"⚠️ No demo found for '{company_name}'.", source=source)
+            return await send_message_async(number=sender, message=f"⚠️ No demo found for '{company_name}'.", source=source)
 
         # --- START: TIMEZONE-AWARE PARSING FOR RESCHEDULE ---
         new_start_time_naive = dateparser.parse(new_time_str, settings={'DATE_ORDER': 'DMY', 'PREFER_DATES_FROM': 'future'})
         if not new_start_time_naive:
-            return send_message(number=sender, message=f"⚠️ Could not find a valid new date/time in '{new_time_str}'.", source=source)
+            return await send_message_async(number=sender, message=f"⚠️ Could not find a valid new date/time in '{new_time_str}'.", source=source)
         
         new_start_time_local = LOCAL_TIMEZONE.localize(new_start_time_naive)
         new_start_time_utc = new_start_time_local.astimezone(UTC)
@@ -196,7 +202,7 @@ async def handle_demo_reschedule(db: Session, message_text: str, sender: str, re
         
         if new_start_time < datetime.utcnow():
             error_msg = f"❌ The new start time you entered ({new_start_time_local.strftime('%d-%b-%Y %I:%M %p')}) is in the past. Please use a future date."
-            return send_message(number=sender, message=error_msg, source=source)
+            return await send_message_async(number=sender, message=error_msg, source=source)
 
         old_time_utc = UTC.localize(demo.start_time)
         old_time_local = old_time_utc.astimezone(LOCAL_TIMEZONE)
@@ -208,8 +214,8 @@ async def handle_demo_reschedule(db: Session, message_text: str, sender: str, re
             final_assignee_user = db.query(User).filter(User.usernumber == demo.assigned_to).first()
 
         if not final_assignee_user:
-             logger.error(f"Could not find user for phone number {demo.assigned_to} during reschedule.")
-             return send_message(number=sender, message="❌ Internal error: Could not verify assignee.", source=source)
+             logger.error("Could not find user for phone number %s during reschedule.", demo.assigned_to)
+             return await send_message_async(number=sender, message="❌ Internal error: Could not verify assignee.", source=source)
 
         assignee_name = final_assignee_user.username
         assignee_phone = final_assignee_user.usernumber
@@ -222,7 +228,7 @@ async def handle_demo_reschedule(db: Session, message_text: str, sender: str, re
             conflict_start_utc = conflict.event_time if isinstance(conflict, Event) else conflict.start_time
             conflict_start_local = UTC.localize(conflict_start_utc).astimezone(LOCAL_TIMEZONE)
             error_msg = f"❌ Rescheduling failed. *{assignee_name}* is already booked at that time.\n\nConflict: {conflict_type} with *{conflict_lead_name}* at {conflict_start_local.strftime('%I:%M %p')}"
-            return send_message(number=sender, message=error_msg, source=source)
+            return await send_message_async(number=sender, message=error_msg, source=source)
 
         db.query(Reminder).filter(
             Reminder.lead_id == lead.id, 
@@ -247,7 +253,7 @@ async def handle_demo_reschedule(db: Session, message_text: str, sender: str, re
                 is_hidden_from_activity_log=True
             ))
         
-        logger.info(f"Re-scheduled pre-demo reminders for demo ID {demo.id}")
+        logger.info("Re-scheduled pre-demo reminders for demo ID %s", demo.id)
         
         sender_user = get_user_by_phone(db, sender)
         sender_name = sender_user.username if sender_user else sender
@@ -271,19 +277,19 @@ async def handle_demo_reschedule(db: Session, message_text: str, sender: str, re
                 f"📞 Contact: {contact_name_for_msg} ({contact_phone_for_msg})\n"
                 f"📅 New Time: {new_time_formatted}"
             )
-            send_whatsapp_message(number=format_phone(assignee_phone), message=notify_msg)
-            logger.info(f"Sent reschedule notification to {assignee_name} at {assignee_phone}")
+            send_in_background(send_whatsapp_message_async(number=format_phone(assignee_phone), message=notify_msg, dedupe=True))
+            logger.info("Sent reschedule notification to %s at %s", assignee_name, assignee_phone)
 
         confirmation_msg = f"🔄 Demo for {company_name} was rescheduled to {new_time_formatted}. Reminders have been updated."
         if extract_assignee(message_text, db):
             confirmation_msg += f"\n👤 It is now assigned to: {assignee_name}"
 
-        return send_message(number=sender, message=confirmation_msg, source=source)
+        return await send_message_async(number=sender, message=confirmation_msg, source=source)
 
     except Exception as e:
-        logger.error(f"❌ Error in demo reschedule: {e}", exc_info=True)
+        logger.error("❌ Error in demo reschedule: %s", e, exc_info=True)
         db.rollback()
-        return send_message(number=sender, message="❌ Failed to reschedule demo due to an internal error.", source=source)
+        return await send_message_async(number=sender, message="❌ Failed to reschedule demo due to an internal error.", source=source)
 
 
 
@@ -291,16 +297,16 @@ async def handle_post_demo(db: Session, message_text: str, sender: str, reply_ur
     try:
         company_name = extract_company_name(message_text)
         if not company_name:
-            return send_message(number=sender, message="⚠️ Please include the company name, e.g., 'demo done for [Company]'", source=source)
+            return await send_message_async(number=sender, message="⚠️ Please include the company name, e.g., 'demo done for [Company]'", source=source)
 
-        logger.info(f"Handling post-demo for company: {company_name}")
+        logger.info("Handling post-demo for company: %s", company_name)
         lead = get_lead_by_company(db, company_name)
         if not lead:
-            return send_message(number=sender, message=f"❌ Lead not found for company: {company_name}", source=source)
+            return await send_message_async(number=sender, message=f"❌ Lead not found for company: {company_name}", source=source)
 
         demo = db.query(Demo).filter(Demo.lead_id == lead.id).order_by(Demo.start_time.desc()).first()
         if not demo:
-             return send_message(number=sender, message=f"⚠️ No demo record found for '{company_name}'.", source=source)
+             return await send_message_async(number=sender, message=f"⚠️ No demo record found for '{company_name}'.", source=source)
         
         sender_user = get_user_by_phone(db, sender)
         sender_name = sender_user.username if sender_user else sender
@@ -309,15 +315,14 @@ async def handle_post_demo(db: Session, message_text: str, sender: str, reply_ur
         demo.phase = "Done"
         demo.remark = demo_remark
         demo.updated_at = datetime.utcnow()
-        db.commit()
 
-        update_lead_status(db, lead_id=lead.id, status="Demo Done", updated_by=sender_name, remark=demo_remark)
+        update_lead_status(db, lead_id=lead.id, status="Demo Done", updated_by=sender_name, remark=demo_remark, commit=False)
 
         follow_up_time = demo.start_time + timedelta(days=3)
         
         assignee_user = db.query(User).filter(User.usernumber == demo.assigned_to).first()
         if not assignee_user:
-             logger.warning(f"Could not find user with number {demo.assigned_to} to set reminder. Skipping reminder.")
+             logger.warning("Could not find user with number %s to set reminder. Skipping reminder.", demo.assigned_to)
         else:
             reminder = Reminder(
                 lead_id=lead.id,
@@ -329,12 +334,14 @@ async def handle_post_demo(db: Session, message_text: str, sender: str, reply_ur
                 created_at=datetime.utcnow()
             )
             db.add(reminder)
-            db.commit()
+
+        # One commit for the demo phase, status change, activity log and follow-up reminder.
+        db.commit()
 
         confirmation_msg = f"✅ Marked demo for '{company_name}' as Done and set a 3-day follow-up reminder for the assignee."
-        return send_message(number=sender, message=confirmation_msg, source=source)
+        return await send_message_async(number=sender, message=confirmation_msg, source=source)
 
     except Exception as e:
         db.rollback()
-        logger.error(f"❌ Error in handle_post_demo: {e}", exc_info=True)
-        return send_message(number=sender, message="❌ Failed to update demo status due to an internal error.", source=source)
\ No newline at end of file
+        logger.error("❌ Error in handle_post_demo: %s", e, exc_info=True)
+        return await send_message_async(number=sender, message="❌ Failed to update demo status due to an internal error.", source=source)
\ No newline at end of file
@@ -7,7 +7,7 @@ from dateparser.search import search_dates
 
 from app.crud import get_lead_by_company, create_activity_log, get_user_by_name, create_reminder, find_and_complete_reminder
 from app.schemas import ActivityLogCreate, ReminderCreate
-from app.message_sender import send_message # Only send_message is needed here
+from app.message_sender import send_message_async # Only send_message_async is needed here
 
 logger = logging.getLogger(__name__)
 
@@ -35,12 +35,12 @@ async def handle_log_discussion(db: Session, msg_text: str, sender: str, reply_u
     company_name, details = parse_log_or_done_message("log discussion", msg_text)
     if not company_name:
         # Corrected: send_message arguments
-        return send_message(number=sender, message="⚠️ Invalid format. Use: `log discussion for [Company], [details]`", source=source)
+        return await send_message_async(number=sender, message="⚠️ Invalid format. Use: `log discussion for [Company], [details]`", source=source)
 
     lead = get_lead_by_company(db, company_name)
     if not lead:
         # Corrected: send_message arguments
-        return send_message(number=sender, message=f"❌ Lead not found for '{company_name}'.", source=source)
+        return await send_message_async(number=sender, message=f"❌ Lead not found for '{company_name}'.", source=source)
 
     # Log the discussion as a completed activity
     create_activity_log(db, ActivityLogCreate(
@@ -50,7 +50,7 @@ async def handle_log_discussion(db: Session, msg_text: str, sender: str, reply_u
     ))
 
     # Corrected: send_message arguments
-    return send_message(number=sender, message=f"✅ Discussion for *{lead.company_name}* has been logged.", source=source)
+    return await send_message_async(number=sender, message=f"✅ Discussion for *{lead.company_name}* has been logged.", source=source)
 
 
 async def handle_schedule_discussion(db: Session, msg_text: str, sender: str, reply_url: str, source: str):
@@ -58,25 +58,25 @@ async def handle_schedule_discussion(db: Session, msg_text: str, sender: str, re
     company_name, details = parse_schedule_message(msg_text)
     if not company_name:
         # Corrected: send_message arguments
-        return send_message(number=sender, message="⚠️ Invalid format. Use: `schedule discussion for [Company], [details including date/time]`", source=source)
+        return await send_message_async(number=sender, message="⚠️ Invalid format. Use: `schedule discussion for [Company], [details including date/time]`", source=source)
     
     lead = get_lead_by_company(db, company_name)
     if not lead:
         # Corrected: send_message arguments
-        return send_message(number=sender, message=f"❌ Lead not found for '{company_name}'.", source=source)
+        return await send_message_async(number=sender, message=f"❌ Lead not found for '{company_name}'.", source=source)
 
     # Find a date in the details
     parsed_dates = search_dates(details, settings={'PREFER_DATES_FROM': 'future'})
     if not parsed_dates:
         # Corrected: send_message arguments
-        return send_message(number=sender, message="⚠️ No future date found in the details. Please specify when to schedule the discussion (e.g., 'tomorrow at 2pm').", source=source)
+        return await send_message_async(number=sender, message="⚠️ No future date found in the details. Please specify when to schedule the discussion (e.g., 'tomorrow at 2pm').", source=source)
 
     remind_time = parsed_dates[0][1]
     assignee_user = get_user_by_name(db, lead.assigned_to)
 
     if not assignee_user:
         # Corrected: send_message arguments
-        return send_message(number=sender, message=f"❌ Cannot find assignee '{lead.assigned_to}' to set reminder.", source=source)
+        return await send_message_async(number=sender, message=f"❌ Cannot find assignee '{lead.assigned_to}' to set reminder.", source=source)
 
     # 1. Log the activity that the discussion has been scheduled
     create_activity_log(db, ActivityLogCreate(
@@ -97,7 +97,7 @@ async def handle_schedule_discussion(db: Session, msg_text: str, sender: str, re
 
     success_msg = f"✅ Discussion for *{lead.company_name}* has been scheduled.\n\n⏰ A reminder has been set for the assignee for {remind_time.strftime('%A, %b %d at %I:%M %p')}."
     # Corrected: send_message arguments
-    return send_message(number=sender, message=success_msg, source=source)
+    return await send_message_async(number=sender, message=success_msg, source=source)
 
 
 async def handle_discussion_done(db: Session, msg_text: str, sender: str, reply_url: str, source: str):
@@ -105,12 +105,12 @@ async def handle_discussion_done(db: Session, msg_text: str, sender: str, reply_
     company_name, details = parse_log_or_done_message("discussion done", msg_text)
     if not company_name:
         # Corrected: send_message arguments
-        return send_message(number=sender, message="⚠️ Invalid format. Use: `discussion done for [Company], [outcome notes]`", source=source)
+        return await send_message_async(number=sender, message="⚠️ Invalid format. Use: `discussion done for [Company], [outcome notes]`", source=source)
 
     lead = get_lead_by_company(db, company_name)
     if not lead:
         # Corrected: send_message arguments
-        return send_message(number=sender, message=f"❌ Lead not found for '{company_name}'.", source=source)
+        return await send_message_async(number=sender, message=f"❌ Lead not found for '{company_name}'.", source=source)
     
     # 1. Log the completion activity
     create_activity_log(db, ActivityLogCreate(
@@ -127,4 +127,4 @@ async def handle_discussion_done(db: Session, msg_text: str, sender: str, reply_
         success_msg += "\n\nThe scheduled reminder for this discussion has been marked as complete."
 
     # Corrected: send_message arguments
-    return send_message(number=sender, message=success_msg, source=source)
\ No newline at end of file
+    return await send_message_async(number=sender, message=success_msg, source=source)
\ No newline at end of file
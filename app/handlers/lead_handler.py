@@ -2,13 +2,14 @@
 import logging
 from sqlalchemy.orm import Session
 from app.crud import (
+    LEAD_COLUMN_NAMES,
     get_user_by_phone,
     get_user_by_name,
     get_lead_by_company,
     save_lead,
     create_activity_log
 )
-from app.message_sender import send_whatsapp_message, send_message, format_phone 
+from app.message_sender import send_whatsapp_message_async, send_message_async, format_phone, send_in_background
 from app.schemas import LeadCreate, ContactCreate, ActivityLogCreate
 from app.gpt_parser import parse_lead_info, parse_update_fields
 from app.temp_store import temp_store
@@ -21,22 +22,22 @@ async def handle_new_lead(db: Session, message_text: str, created_by: str, reply
         parsed_data, polite_message = parse_lead_info(message_text)
         
         if not parsed_data or "company_name" not in parsed_data or parsed_data.get("missing_fields"):
-            return send_message(number=created_by, message=polite_message, source=source)
+            return await send_message_async(number=created_by, message=polite_message, source=source)
 
         logger.info("🎯 Handling new lead with parsed data: %s", parsed_data)
 
         required_for_lead_creation = ["company_name", "phone", "assigned_to", "source"]
         if not all(parsed_data.get(field) for field in required_for_lead_creation):
             missing = [f for f in required_for_lead_creation if not parsed_data.get(f)]
-            return send_message(number=created_by, message=f"🙏 Please provide all required fields: {', '.join(missing).replace('_', ' ').title()}.", source=source)
+            return await send_message_async(number=created_by, message=f"🙏 Please provide all required fields: {', '.join(missing).replace('_', ' ').title()}.", source=source)
 
         existing = get_lead_by_company(db, parsed_data["company_name"])
         if existing:
-            return send_message(number=created_by, message=f"⚠️ Leaad for '{parsed_data['company_name']}' already exists.", source=source)
+            return await send_message_async(number=created_by, message=f"⚠️ Leaad for '{parsed_data['company_name']}' already exists.", source=source)
 
         assignee_user = get_user_by_name(db, parsed_data["assigned_to"])
         if not assignee_user:
-            return send_message(number=created_by, message=f"❌ Assigned user '{parsed_data['assigned_to']}' not found. Please provide a valid assignee.", source=source)
+            return await send_message_async(number=created_by, message=f"❌ Assigned user '{parsed_data['assigned_to']}' not found. Please provide a valid assignee.", source=source)
 
         contacts_to_create = []
         if parsed_data.get("contact_name") or parsed_data.get("phone"):
@@ -99,25 +100,25 @@ async def handle_new_lead(db: Session, message_text: str, created_by: str, reply
                 f"📍 Source: {created_lead.source}"
             )
             
-            logger.info(f"Attempting to send WhatsApp notification to assignee: Usernumber={assignee_user.usernumber}, Message='{notification_msg}'")
-            send_whatsapp_message(number=assignee_user.usernumber, message=notification_msg)
-            logger.info(f"Sent new lead notification to assignee {assignee_user.username} ({assignee_user.usernumber})")
+            logger.info("Attempting to send WhatsApp notification to assignee: Usernumber=%s, Message='%s'", assignee_user.usernumber, notification_msg)
+            send_in_background(send_whatsapp_message_async(number=assignee_user.usernumber, message=notification_msg, dedupe=True))
+            logger.info("Sent new lead notification to assignee %s (%s)", assignee_user.username, assignee_user.usernumber)
         else:
-            logger.warning(f"Skipping assignee WhatsApp notification: Assignee '{assignee_user.username}' has no usernumber configured.")
+            logger.warning("Skipping assignee WhatsApp notification: Assignee '%s' has no usernumber configured.", assignee_user.username)
 
 
         confirmation_msg = f"✅ New lead *{created_lead.company_name}* created and assigned to *{created_lead.assigned_to}*."
         
-        return send_message(number=created_by, message=confirmation_msg, source=source)
+        return await send_message_async(number=created_by, message=confirmation_msg, source=source)
 
     except ValueError as e:
-        logger.error(f"❌ Lead creation failed: {e}")
+        logger.error("❌ Lead creation failed: %s", e)
         db.rollback()
-        return send_message(number=created_by, message=f"❌ Failed to create lead: {e}", source=source)
+        return await send_message_async(number=created_by, message=f"❌ Failed to create lead: {e}", source=source)
     except Exception as e:
-        logger.error(f"❌ An unexpected error occurred during lead creation: {e}", exc_info=True)
+        logger.error("❌ An unexpected error occurred during lead creation: %s", e, exc_info=True)
         db.rollback()
-        return send_message(number=created_by, message="❌ An internal error occurred while creating the lead.", source=source)
+        return await send_message_async(number=created_by, message="❌ An internal error occurred while creating the lead.", source=source)
 
 
 async def handle_update_lead(db: Session, message_text: str, sender: str, reply_url: str, company_name: str = None, source: str = "whatsapp"):
@@ -127,29 +128,29 @@ async def handle_update_lead(db: Session, message_text: str, sender: str, reply_
         company_name = company_name or update_fields.get("company_name") or temp_store.get(sender)
         if not company_name:
             response_msg = "⚠️ Please mention the company name to update."
-            return send_message(number=sender, message=response_msg, source=source)
+            return await send_message_async(number=sender, message=response_msg, source=source)
 
         lead = get_lead_by_company(db, company_name)
         if not lead:
             response_msg = f"❌ No lead found for {company_name}"
-            return send_message(number=sender, message=response_msg, source=source)
+            return await send_message_async(number=sender, message=response_msg, source=source)
 
         updated_fields = []
         for field, value in update_fields.items():
-            if hasattr(lead, field) and value:
+            if field in LEAD_COLUMN_NAMES and value:
                 setattr(lead, field, value)
                 updated_fields.append(field)
 
         if not updated_fields:
             response_msg = "⚠️ No valid fields found in your message to update."
-            return send_message(number=sender, message=response_msg, source=source)
+            return await send_message_async(number=sender, message=response_msg, source=source)
 
         db.commit()
 
         temp_store.set(sender, company_name)
         confirmation_message = f"✅ Lead for '{company_name}' updated: {', '.join(updated_fields)}. Now schedule Demo for '{company_name}'"
-        return send_message(number=sender, message=confirmation_message, source=source)
+        return await send_message_async(number=sender, message=confirmation_message, source=source)
 
     except Exception as e:
         logger.error("Error updating lead: %s", str(e), exc_info=True)
-        return send_message(number=sender, message="❌ Something went wrong during the update.", source=source)
\ No newline at end of file
+        return await send_message_async(number=sender, message="❌ Something went wrong during the update.", source=source)
\ No newline at end of file
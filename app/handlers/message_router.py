@@ -1,13 +1,15 @@
 # app/handlers/message_router.py
 
 import re
+import asyncio
 import logging
+import weakref
 from sqlalchemy.orm import Session
 from app.db import get_db_session_for_company, COMPANY_TO_ENV_MAP
 from app.models import User 
 from app.crud import get_user_by_phone, update_lead_status, get_user_by_name, get_lead_by_company
 from app.gpt_parser import parse_intent_and_fields, parse_lead_info, parse_update_company
-from app.message_sender import send_message 
+from app.message_sender import send_message_async
 from app.handlers import (
     lead_handler,
     qualification_handler,
@@ -25,6 +27,25 @@ from typing import Tuple, Optional
 
 logger = logging.getLogger(__name__)
 
+# One lock per sender, held for the whole turn, so two messages from the same
+# sender cannot interleave their read-modify-write of pending_context. Locks are
+# only kept alive while a turn is using them.
+_sender_locks = weakref.WeakValueDictionary()
+
+_COMPANY_PATTERNS = [
+    re.compile(r"(?:for|with|of)\s+([A-Za-z0-9\s&.'-]+?)(?=\s+on|\s+at|\s+to|\s+next|\s+is|$|,)", re.IGNORECASE)
+]
+_REMARK_RE = re.compile(r"(?:because|reason|remark)\s+(.*)", re.IGNORECASE)
+_GREETING_RE = re.compile(r"\b(?:hi|hello|hii|hey)\b")
+
+
+def _get_sender_lock(sender: str) -> asyncio.Lock:
+    lock = _sender_locks.get(sender)
+    if lock is None:
+        lock = asyncio.Lock()
+        _sender_locks[sender] = lock
+    return lock
+
 
 # This function remains as is, it's already correct.
 def find_user_and_get_db_session(sender_phone: str) -> Tuple[Optional[User], Optional[Session]]:
@@ -35,7 +56,7 @@ def find_user_and_get_db_session(sender_phone: str) -> Tuple[Optional[User], Opt
         A tuple containing the found User object and the corresponding database Session,
         or (None, None) if the user is not found in any database.
     """
-    logger.info(f"Searching for user with phone number {sender_phone} across all companies...")
+    logger.info("Searching for user with phone number %s across all companies...", sender_phone)
     all_companies = list(COMPANY_TO_ENV_MAP.keys())
 
     for company in all_companies:
@@ -43,24 +64,21 @@ def find_user_and_get_db_session(sender_phone: str) -> Tuple[Optional[User], Opt
         try:
             user = get_user_by_phone(db, sender_phone)
             if user:
-                logger.info(f"✅ User found in company: '{company}'. Returning user and session.")
+                logger.info("✅ User found in company: '%s'. Returning user and session.", company)
                 return user, db
             else:
                 db.close()
         except Exception as e:
-            logger.error(f"Error checking company '{company}' for user {sender_phone}: {e}")
+            logger.error("Error checking company '%s' for user %s: %s", company, sender_phone, e)
             db.close() # Ensure session is closed on error
     
-    logger.warning(f"User with phone number {sender_phone} not found in any configured company.")
+    logger.warning("User with phone number %s not found in any configured company.", sender_phone)
     return None, None
 
 
 def extract_company_name(text: str) -> str:
-    patterns = [
-        r"(?:for|with|of)\s+([A-Za-z0-9\s&.'-]+?)(?=\s+on|\s+at|\s+to|\s+next|\s+is|$|,)"
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
+    for pattern in _COMPANY_PATTERNS:
+        match = pattern.search(text)
         if match:
             company = match.group(1).strip()
             if company.lower() in ["the", "a", "an"]:
@@ -69,13 +87,19 @@ def extract_company_name(text: str) -> str:
     return ""
 
 async def route_message(sender: str, message_text: str, reply_url: str, source: str = "whatsapp", db: Optional[Session] = None):
+    # Normalised once here so handlers and senders can compare it directly.
+    source = source.strip().lower()
+    async with _get_sender_lock(sender):
+        return await _route_message(sender, message_text, reply_url, source, db)
+
+async def _route_message(sender: str, message_text: str, reply_url: str, source: str, db: Optional[Session]):
     is_session_managed_locally = False
     
     if db is None:
         user, db = find_user_and_get_db_session(sender)
         is_session_managed_locally = True # Mark that this function created the session.
         if not user or not db:
-            return send_message(
+            return await send_message_async(
                 number=sender,
                 message="❌ Access Denied. Your phone number is not registered with any company in our system.",
                 source=source
@@ -85,9 +109,8 @@ async def route_message(sender: str, message_text: str, reply_url: str, source:
 
     try:
         context = qualification_handler.pending_context.get(sender)
-        if sender in pending_context:
-            context = pending_context[sender]
-            logger.info(f"Found pending context for {sender}: {context}")
+        if context is not None:
+            logger.info("Found pending context for %s: %s", sender, context)
             
             context_handlers = {
                 "qualification_pending": qualification_handler.handle_qualification,
@@ -100,11 +123,11 @@ async def route_message(sender: str, message_text: str, reply_url: str, source:
 
             handler = context_handlers.get(context.get("intent"))
             if handler:
-                logger.info(f"Routing message from {sender} to {context.get('intent')} handler.")
+                logger.info("Routing message from %s to %s handler.", sender, context.get('intent'))
                 return await handler(db=db, msg_text=message_text, sender=sender, reply_url=reply_url, source=source)
 
         intent, _ = parse_intent_and_fields(lowered_text)
-        logger.info(f"Detected Intent: {intent} for message: '{message_text}'")
+        logger.info("Detected Intent: %s for message: '%s'", intent, message_text)
 
         if "discussion done for" in lowered_text:
             return await discussion_handler.handle_discussion_done(db, message_text, sender, reply_url, source)
@@ -125,11 +148,11 @@ async def route_message(sender: str, message_text: str, reply_url: str, source:
             company = parse_update_company(message_text)
             lead = get_lead_by_company(db, company)
             if not lead:
-                return send_message(number=sender, message=f"❌ Lead not found for '{company}'.", source=source)
-            remark_match = re.search(r"(?:because|reason|remark)\s+(.*)", message_text, re.IGNORECASE)
+                return await send_message_async(number=sender, message=f"❌ Lead not found for '{company}'.", source=source)
+            remark_match = _REMARK_RE.search(message_text)
             remark = remark_match.group(1).strip() if remark_match else "Not interested after initial contact."
             update_lead_status(db, lead.id, "Unqualified", updated_by=str(sender), remark=remark)
-            return send_message(number=sender, message=f"✅ Marked '{company}' as Unqualified. Remark: '{remark}'.", source=source)
+            return await send_message_async(number=sender, message=f"✅ Marked '{company}' as Unqualified. Remark: '{remark}'.", source=source)
 
 
         elif "reschedule meeting" in lowered_text:
@@ -156,8 +179,7 @@ async def route_message(sender: str, message_text: str, reply_url: str, source:
         elif intent == "qualify_lead":
             return await qualification_handler.handle_qualification(db=db, msg_text=message_text, sender=sender, reply_url=reply_url, source=source)
         
-        greeting_keywords = [r"\bhi\b", r"\bhello\b", r"\bhii\b", r"\bhey\b"]
-        if any(re.search(kw, lowered_text) for kw in greeting_keywords):
+        if _GREETING_RE.search(lowered_text):
             polite_msg = (
                 "👋 Hi! To create a new lead, please provide the following details:\n\n"
                 "📌 Company Name\n"
@@ -168,7 +190,7 @@ async def route_message(sender: str, message_text: str, reply_url: str, source:
                 "📒 Example:\n"
                 "'There is a lead from ABC Pvt Ltd, contact is Ramesh (9876543210), Source Referral, assign to Banwari.'"
             )
-            return send_message(number=sender, message=polite_msg, source=source)
+            return await send_message_async(number=sender, message=polite_msg, source=source)
 
         else:
             fallback = (
@@ -177,13 +199,13 @@ async def route_message(sender: str, message_text: str, reply_url: str, source:
                 "➡️ 'Log discussion for ...'\n"
                 "➡️ 'Schedule meeting with ...'"
             )
-            return send_message(number=sender, message=fallback, source=source)
+            return await send_message_async(number=sender, message=fallback, source=source)
 
     except Exception as e:
-        logger.error(f"❌ Exception in route_message: {e}", exc_info=True)
+        logger.error("❌ Exception in route_message: %s", e, exc_info=True)
         if sender in pending_context:
             pending_context.pop(sender, None)
-        return send_message(number=sender, message="❌ An internal error occurred.", source=source)
+        return await send_message_async(number=sender, message="❌ An internal error occurred.", source=source)
 
     finally:
         if db and is_session_managed_locally:
@@ -1,17 +1,83 @@
 # qualification_handler
+import operator
 import re
-from typing import Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 import logging
 from app.gpt_parser import parse_update_company, parse_update_fields
-from app.models import Lead, Event, User
-from app.crud import get_lead_by_company, create_event, get_user_by_name, update_lead_status, get_user_by_phone # Added get_user_by_phone
-from app.schemas import EventCreate
-from app.message_sender import format_phone, send_message, send_whatsapp_message
+from app.models import Contact, Lead, User
+from app.crud import get_lead_by_company, get_lead_with_assignee, update_lead_status
+from app.message_sender import format_phone, send_in_background, send_message_async, send_whatsapp_message_async
+from app.temp_store import ContextStore
 
 logger = logging.getLogger(__name__)
 
-pending_context = {}
+# Abandoned conversations are dropped after this long so their intent cannot
+# misroute a later, unrelated message from the same sender.
+PENDING_CONTEXT_TTL_SECONDS = 1800
+PENDING_CONTEXT_MAX_SENDERS = 10000
+
+pending_context = ContextStore(maxsize=PENDING_CONTEXT_MAX_SENDERS, ttl=PENDING_CONTEXT_TTL_SECONDS)
+
+_lead_contacts = operator.attrgetter("contacts")
+
+# Lead columns that parse_update_fields may hand back for a qualification update.
+_LEAD_UPDATABLE = frozenset({
+    "email", "address", "team_size", "segment", "remark", "phone_2",
+    "turnover", "current_system", "machine_specification", "challenges",
+})
+
+# (Lead attribute, label) pairs prompted for after a lead is qualified.
+_QUALIFICATION_CHECKS = (
+    ("address", "Address"),
+    ("segment", "Segment"),
+    ("team_size", "Team Size"),
+    ("turnover", "Turnover"),
+    ("current_system", "Current System"),
+    ("machine_specification", "Machine Specification"),
+    ("challenges", "Challenges"),
+)
+
+# Only these columns are read to build the missing-fields prompt, so they are
+# selected as a plain row rather than refreshing the whole Lead object.
+_QUALIFICATION_PROBE = select(
+    *(getattr(Lead, attr) for attr, _ in _QUALIFICATION_CHECKS), Lead.remark
+)
+_PRIMARY_CONTACT_PROBE = select(Contact.id, Contact.email).order_by(Contact.id).limit(1)
+
+# Placeholder remark left on older leads; it counts as no remark at all.
+NO_REMARK = "No remark provided."
+
+
+def has_remark(remark) -> bool:
+    return bool(remark) and not remark.startswith(NO_REMARK)
+
+# Yes/No replies are matched on whole words so "yesterday" does not count as "yes".
+_POSITIVE_REPLIES = frozenset({"yes", "y", "ok", "okay", "sure", "schedule"})
+_POSITIVE_PHRASES = frozenset({"do it"})
+_NEGATIVE_REPLIES = frozenset({"no", "skip", "later", "none"})
+_WORD_RE = re.compile(r"\w+")
+
+
+def is_positive_reply(msg_text: str) -> bool:
+    text = msg_text.strip().casefold()
+    return text in _POSITIVE_PHRASES or not _POSITIVE_REPLIES.isdisjoint(_WORD_RE.findall(text))
+
+
+def set_pending_context(sender: str, context: dict):
+    """Stores the conversation context for a sender; it expires after PENDING_CONTEXT_TTL_SECONDS."""
+    pending_context[sender] = context
+
+
+def _get_context_lead(db: Session, context: dict):
+    """
+    Loads the lead a follow-up turn refers to by primary key, falling back to the
+    company name for contexts stored without a lead_id.
+    """
+    lead_id = context.get("lead_id")
+    if lead_id is not None:
+        return db.get(Lead, lead_id)
+    return get_lead_by_company(db, context["company_name"])
 
 
 async def handle_unqualification(db: Session, msg_text: str, sender: str, reply_url: str, source: str, status: str):
@@ -24,14 +90,14 @@ async def handle_unqualification(db: Session, msg_text: str, sender: str, reply_
     if not company_name:
         # If company name is missing, we can ask for it.
         context_key = "unqualification_pending" if status == "unqualified" else "segment_pending"
-        pending_context[sender] = {"intent": context_key}
-        # Corrected: send_message arguments
-        return send_message(number=sender, message="Which company are you referring to?", source=source)
+        set_pending_context(sender, {"intent": context_key})
+        return await send_message_async(number=sender, message="Which company are you referring to?", source=source)
 
-    lead = get_lead_by_company(db, company_name)
+    lead, assignee = get_lead_with_assignee(db, company_name)
     if not lead:
-        # Corrected: send_message arguments
-        return send_message(number=sender, message=f"❌ No lead found for company: '{company_name}'.", source=source)
+        return await send_message_async(number=sender, message=f"❌ No lead found for company: '{company_name}'.", source=source)
+    # Read before update_lead_status commits and expires the loaded rows.
+    assignee_name, assignee_number = (assignee.username, assignee.usernumber) if assignee else (None, None)
     
     # Determine the human-readable status for the message
     status_text = "Not Qualified" if status == "unqualified" else "Not Our Segment"
@@ -42,19 +108,18 @@ async def handle_unqualification(db: Session, msg_text: str, sender: str, reply_
     # Clear any pending context for this user
     pending_context.pop(sender, None)
 
-    # Notify the original assignee if they are not the one updating the status
-    if lead.assigned_to:
-        assignee = get_user_by_name(db, lead.assigned_to)
+    # Notify the original assignee if they are not the one updating the status.
+    # The notification is sent in the background so it does not delay the reply.
+    if assignee_name:
         sender_user = db.query(User).filter(User.usernumber == sender).first()
         sender_name = sender_user.username if sender_user else str(sender)
 
-        if assignee and assignee.username != sender_name:
+        if assignee_name != sender_name:
             notification = f"📢 Lead Status Update: The lead for '{company_name}' has been marked as '{status_text}' by {sender_name}."
-            # --- CRITICAL FIX: Corrected send_whatsapp_message call ---
-            send_whatsapp_message(number=assignee.usernumber, message=notification)
+            send_in_background(send_whatsapp_message_async(number=assignee_number, message=notification, dedupe=True))
 
-    # Corrected: send_message arguments
-    return send_message(number=sender, message=f"✅ Understood. Lead for '{company_name}' has been marked as '{status_text}'.", source=source)
+    reply = f"✅ Understood. Lead for '{company_name}' has been marked as '{status_text}'."
+    return await send_message_async(number=sender, message=reply, source=source)
 
 
 async def handle_qualification(db: Session, msg_text: str, sender: str, reply_url: str, source: str = "whatsapp"):
@@ -62,106 +127,86 @@ async def handle_qualification(db: Session, msg_text: str, sender: str, reply_ur
     Handles the entire lead qualification flow, including asking for a company name if missing
     and prompting for additional details after qualification.
     """
-    logger.info(f"🔍 Handling qualification for '{msg_text}' from {sender}. Context: {pending_context.get(sender)}")
+    logger.info("🔍 Handling qualification for '%s' from %s. Context: %s", msg_text, sender, pending_context.get(sender))
     
     company_name = None
 
-    if sender in pending_context and pending_context[sender].get("intent") == "qualification_pending":
+    if (pending_context.get(sender) or {}).get("intent") == "qualification_pending":
         company_name = msg_text.strip()
         pending_context.pop(sender, None)
-        logger.info(f"✅ Resumed qualification for {sender} with company: {company_name}")
+        logger.info("✅ Resumed qualification for %s with company: %s", sender, company_name)
     else:
         company_name = parse_update_company(msg_text)
-        logger.info(f"📝 Parsed initial message, found company: '{company_name}'")
+        logger.info("📝 Parsed initial message, found company: '%s'", company_name)
 
     if not company_name:
-        pending_context[sender] = {"intent": "qualification_pending"}
-        logger.warning(f"⚠️ Company name not found. Prompting user {sender}.")
-        # Corrected: send_message arguments
-        return send_message(number=sender, message="❌ Couldn't find company name. Please reply with just the company name.", source=source)
+        set_pending_context(sender, {"intent": "qualification_pending"})
+        logger.warning("⚠️ Company name not found. Prompting user %s.", sender)
+        return await send_message_async(number=sender, message="❌ Couldn't find company name. Please reply with just the company name.", source=source)
 
-    lead = get_lead_by_company(db, company_name)
+    lead, assignee = get_lead_with_assignee(db, company_name)
     if not lead:
-        logger.error(f"❌ Lead not found for company: {company_name}")
-        # Corrected: send_message arguments
-        return send_message(number=sender, message=f"❌ No lead found with company: '{company_name}'. Please check the name and try again.", source=source)
+        logger.error("❌ Lead not found for company: %s", company_name)
+        return await send_message_async(number=sender, message=f"❌ No lead found with company: '{company_name}'. Please check the name and try again.", source=source)
+    # Read before update_lead_status commits and expires the loaded rows.
+    lead_id = lead.id
+    assignee_number = assignee.usernumber if assignee else None
 
-    update_lead_status(db, lead_id=lead.id, status="Qualified", updated_by=str(sender))
+    update_lead_status(db, lead_id=lead_id, status="Qualified", updated_by=str(sender))
     
     # --- Independent Assignee Notification ---
-    if lead.assigned_to:
-        user = get_user_by_name(db, lead.assigned_to)
-        # Ensure sender is a string for comparison
-        sender_identifier = str(sender)
-        if user and user.usernumber and user.usernumber != sender_identifier:
-            # --- CRITICAL FIX: Corrected send_whatsapp_message call ---
-            send_whatsapp_message(
-                number=format_phone(user.usernumber),
-                message=f"📢 Lead Qualified: The lead for {company_name} has been marked as qualified."
-            )
-
-    reply_parts = [f"✅ Lead for '{company_name}' marked as Qualified."]
-    
-    missing_fields = []
-    if not lead.address: missing_fields.append("Address")
-    if not lead.segment: missing_fields.append("Segment")
-    if not lead.team_size: missing_fields.append("Team Size")
-    if not lead.turnover: missing_fields.append("Turnover")
-    if not lead.current_system: missing_fields.append("Current System")
-    if not lead.machine_specification: missing_fields.append("Machine Specification")
-    if not lead.challenges: missing_fields.append("Challenges")
+    # Sent in the background so it does not delay the reply below.
+    # Ensure sender is a string for comparison
+    if assignee_number and assignee_number != str(sender):
+        send_in_background(send_whatsapp_message_async(
+            number=format_phone(assignee_number),
+            message=f"📢 Lead Qualified: The lead for {company_name} has been marked as qualified.",
+            dedupe=True,
+        ))
+
+    probe = db.execute(_QUALIFICATION_PROBE.where(Lead.id == lead_id)).one()
+    missing_fields = [label for attr, label in _QUALIFICATION_CHECKS if not getattr(probe, attr)]
     
-    # --- CORRECTION: Check for contact email properly ---
-    # lead.contacts is a relationship, it needs to be accessed to load the list.
-    # It might be an empty list if no contacts exist.
-    if lead.contacts:
-        primary_contact = lead.contacts[0]
-        if not primary_contact.email:
-            missing_fields.append("Email for primary contact")
-    else: # If there are no contacts at all
+    # The lead may have no contacts at all.
+    primary_contact = db.execute(_PRIMARY_CONTACT_PROBE.where(Contact.lead_id == lead_id)).first()
+    if primary_contact is None:
         missing_fields.append("Primary Contact Details (Phone, Email)")
-    # --- END CORRECTION ---
+    elif not primary_contact.email:
+        missing_fields.append("Email for primary contact")
     
-    if not lead.remark or "No remark provided." in lead.remark:
+    if not has_remark(probe.remark):
         missing_fields.append("Remark")
     
     if missing_fields:
-        ask_msg = (
-            f"Some details are missing for this lead. If you have them, please provide:\n👉 " +
-            ", ".join(missing_fields) + "\n\n(Reply with the details, or type 'skip' if you don't have them.)"
+        next_step_msg = (
+            "Some details are missing for this lead. If you have them, please provide:\n👉 "
+            f"{', '.join(missing_fields)}\n\n(Reply with the details, or type 'skip' if you don't have them.)"
         )
-        reply_parts.append(ask_msg)
-        pending_context[sender] = {"intent": "awaiting_qualification_details", "company_name": company_name}
+        set_pending_context(sender, {"intent": "awaiting_qualification_details", "company_name": company_name, "lead_id": lead_id})
     else:
-        ask_4_phase_msg = (
+        next_step_msg = (
             f"All details are complete for {company_name}. Next, do you want to schedule the 4-phase meeting? (Reply with Yes/No)"
         )
-        reply_parts.append(ask_4_phase_msg)
-        pending_context[sender] = {"intent": "awaiting_4_phase_decision", "company_name": company_name}
+        set_pending_context(sender, {"intent": "awaiting_4_phase_decision", "company_name": company_name, "lead_id": lead_id})
 
-    final_reply = "\n\n".join(reply_parts)
-    # Corrected: send_message arguments
-    return send_message(number=sender, message=final_reply, source=source)
+    final_reply = f"✅ Lead for '{company_name}' marked as Qualified.\n\n{next_step_msg}"
+    return await send_message_async(number=sender, message=final_reply, source=source)
 
 
 async def handle_qualification_update(db: Session, msg_text: str, sender: str, reply_url: str, source: str = "whatsapp"):
     context = pending_context.get(sender)
     if not context or context.get("intent") != "awaiting_qualification_details":
-        # Corrected: send_message arguments
-        return send_message(number=sender, message="Sorry, I seem to have lost track. How can I help?", source=source)
+        return await send_message_async(number=sender, message="Sorry, I seem to have lost track. How can I help?", source=source)
 
     company_name = context["company_name"]
     pending_context.pop(sender, None)
 
-    reply_parts = []
-    negative_keywords = ["no", "skip", "later", "none"]
-    if msg_text.lower().strip() in negative_keywords:
-        reply_parts.append(f"👍 Understood. No extra details updated for {company_name}.")
+    if msg_text.strip().casefold() in _NEGATIVE_REPLIES:
+        update_msg = f"👍 Understood. No extra details updated for {company_name}."
     else:
-        lead = get_lead_by_company(db, company_name)
+        lead = _get_context_lead(db, context)
         if not lead:
-            # Corrected: send_message arguments
-            return send_message(number=sender, message=f"❌ Strange, I can no longer find the lead for {company_name}. Please start over.", source=source)
+            return await send_message_async(number=sender, message=f"❌ Strange, I can no longer find the lead for {company_name}. Please start over.", source=source)
 
         update_fields, _ = parse_update_fields(msg_text)
         if not update_fields:
@@ -169,73 +214,65 @@ async def handle_qualification_update(db: Session, msg_text: str, sender: str, r
             # Only do this if the message is not a negative keyword (already checked above)
             if msg_text.strip(): # Ensure there's actual content to add as a remark
                 update_fields['remark'] = msg_text.strip()
-                logger.info(f"No specific fields found in qualification update. Treating message as remark.")
+                logger.info("No specific fields found in qualification update. Treating message as remark.")
 
         updated_fields = []
+        primary_contact = (_lead_contacts(lead) or [None])[0]
         for field, value in update_fields.items():
-            # Check if lead.contacts exists before trying to access lead.contacts[0].email
-            if field == 'email' and lead.contacts:
-                primary_contact = lead.contacts[0]
+            if field == 'email' and primary_contact is not None:
                 primary_contact.email = value
                 # db.commit() will save this change when lead is committed
                 updated_fields.append("Primary Contact Email")
-            elif hasattr(lead, field) and value:
-                if field == 'remark' and lead.remark and "No remark provided." not in lead.remark:
+            elif field in _LEAD_UPDATABLE and value:
+                if field == 'remark' and has_remark(lead.remark):
                     setattr(lead, field, f"{lead.remark}\n--\n{value}")
                 else:
                     setattr(lead, field, value)
                 updated_fields.append(field.replace('_', ' ').title())
         
         if not updated_fields:
-            reply_parts.append("⚠️ I couldn't find any valid fields to update from your message. Let's move on for now.")
+            update_msg = "⚠️ I couldn't find any valid fields to update from your message. Let's move on for now."
         else:
             db.commit()
-            reply_parts.append(f"✅ Details for '{company_name}' updated: {', '.join(updated_fields)}.")
+            update_msg = f"✅ Details for '{company_name}' updated: {', '.join(updated_fields)}."
 
     ask_4_phase_msg = (
         f"Next, do you want to schedule the 4-phase meeting for *{company_name}*? (Reply with Yes/No)"
     )
-    reply_parts.append(ask_4_phase_msg)
     
-    pending_context[sender] = {"intent": "awaiting_4_phase_decision", "company_name": company_name}
-    logger.info(f"Set context for {sender} to 'awaiting_4_phase_decision' for company '{company_name}'")
+    set_pending_context(sender, {"intent": "awaiting_4_phase_decision", "company_name": company_name, "lead_id": context.get("lead_id")})
+    logger.info("Set context for %s to 'awaiting_4_phase_decision' for company '%s'", sender, company_name)
 
-    final_reply = "\n\n".join(reply_parts)
-    # Corrected: send_message arguments
-    return send_message(number=sender, message=final_reply, source=source)
+    final_reply = f"{update_msg}\n\n{ask_4_phase_msg}"
+    return await send_message_async(number=sender, message=final_reply, source=source)
 
 
 async def handle_4_phase_decision(db: Session, msg_text: str, sender: str, reply_url: str, source: str = "whatsapp"):
     context = pending_context.get(sender)
     if not context or context.get("intent") != "awaiting_4_phase_decision":
-        # Corrected: send_message arguments
-        return send_message(number=sender, message="Sorry, I seem to have lost track. How can I help?", source=source)
+        return await send_message_async(number=sender, message="Sorry, I seem to have lost track. How can I help?", source=source)
 
     company_name = context["company_name"]
     pending_context.pop(sender, None)
 
-    lead = get_lead_by_company(db, company_name)
+    lead = _get_context_lead(db, context)
     if not lead:
-        # Corrected: send_message arguments
-        return send_message(number=sender, message=f"❌ Strange, I can no longer find the lead for {company_name}. Please start over.", source=source)
+        return await send_message_async(number=sender, message=f"❌ Strange, I can no longer find the lead for {company_name}. Please start over.", source=source)
 
     final_reply = ""
-    positive_keywords = ["yes", "y", "ok", "okay", "sure", "do it", "schedule", "yes please"]
     
-    if any(keyword in msg_text.lower().strip() for keyword in positive_keywords):
-        logger.info(f"User {sender} agreed to schedule 4-phase meeting for {company_name}. Prompting for command.")
+    if is_positive_reply(msg_text):
+        logger.info("User %s agreed to schedule 4-phase meeting for %s. Prompting for command.", sender, company_name)
         final_reply = (
             f"👍 Great! To schedule the 4-Phase Meeting for *{company_name}*, please use the command:\n\n"
             f"\"Schedule meeting with {company_name} on [Date and Time] assigned to [Person]\""
         )
     else:
-        logger.info(f"User {sender} skipped the 4-phase meeting for {company_name}.")
-        reply_parts = [
-            f"👍 Understood. We will skip the 4-phase meeting for now.",
-            (f"The next step is to schedule a demo. You can use:\n"
-             f"\"Schedule demo for {company_name} on [Date and Time] assigned to [Person Name]\"")
-        ]
-        final_reply = "\n\n".join(reply_parts)
-
-    # Corrected: send_message arguments
-    return send_message(number=sender, message=final_reply, source=source)
\ No newline at end of file
+        logger.info("User %s skipped the 4-phase meeting for %s.", sender, company_name)
+        final_reply = (
+            "👍 Understood. We will skip the 4-phase meeting for now.\n\n"
+            "The next step is to schedule a demo. You can use:\n"
+            f"\"Schedule demo for {company_name} on [Date and Time] assigned to [Person Name]\""
+        )
+
+    return await send_message_async(number=sender, message=final_reply, source=source)
\ No newline at end of file
@@ -1,22 +1,32 @@
 # reassignment_handler
 import logging
-import re
 from sqlalchemy.orm import Session
-from app.crud import get_lead_by_company, get_user_by_phone, get_user_by_name, create_activity_log, create_assignment_log
-from app.message_sender import send_message, format_phone, send_whatsapp_message
-from app.schemas import ActivityLogCreate, AssignmentLogCreate
+from app.crud import get_lead_by_company, get_user_by_phone, get_user_by_name, create_assignment_and_activity
+from app.message_sender import format_phone, send_in_background, send_message_async, send_whatsapp_message_async
 
 logger = logging.getLogger(__name__)
 
+_REASSIGN_KEYWORD = "reassign "
+_ASSIGNEE_SEPARATOR = " to "
+
 def parse_reassignment_message(msg_text: str) -> tuple[str | None, str | None]:
     """
     Parses messages like "reassign [Company Name] to [Assignee Name/Phone]"
+    The split is on the last " to ", so company names such as "Path to Success" stay whole.
     """
-    msg_text = msg_text.strip()
-    match = re.search(r"reassign\s+(.+?)\s+to\s+(.+)", msg_text, re.IGNORECASE)
-    if match:
-        company_raw = match.group(1).strip()
-        assignee_raw = match.group(2).strip()
+    # Whitespace is collapsed first so plain substring searches can stand in for a regex.
+    text = " ".join(msg_text.split())
+    lowered = text.lower()
+    start = lowered.find(_REASSIGN_KEYWORD)
+    if start < 0:
+        return None, None
+    start += len(_REASSIGN_KEYWORD)
+    split_at = lowered.rfind(_ASSIGNEE_SEPARATOR, start)
+    if split_at < 0:
+        return None, None
+    company_raw = text[start:split_at].strip()
+    assignee_raw = text[split_at + len(_ASSIGNEE_SEPARATOR):].strip()
+    if company_raw and assignee_raw:
         return company_raw, assignee_raw
     return None, None
 
@@ -29,13 +39,12 @@ async def handle_reassignment(db: Session, message_text: str, sender: str, reply
 
         if not company_name or not new_assignee_input:
             error_msg = "⚠️ Invalid format. Use: `reassign [Company Name] to [New Assignee]`"
-            # Corrected: send_message arguments
-            return send_message(number=sender, message=error_msg, source=source)
+            return await send_message_async(number=sender, message=error_msg, source=source)
 
-        lead = get_lead_by_company(db, company_name)
+        # Contacts are loaded up front for the assignee notification below.
+        lead = get_lead_by_company(db, company_name, with_contacts=True)
         if not lead:
-            # Corrected: send_message arguments
-            return send_message(number=sender, message=f"❌ No lead found with company: {company_name}", source=source)
+            return await send_message_async(number=sender, message=f"❌ No lead found with company: {company_name}", source=source)
 
         assignee = None
         if new_assignee_input.isdigit():
@@ -44,51 +53,54 @@ async def handle_reassignment(db: Session, message_text: str, sender: str, reply
             assignee = get_user_by_name(db, new_assignee_input)
 
         if not assignee:
-            # Corrected: send_message arguments
-            return send_message(number=sender, message=f"❌ Couldn't find user: {new_assignee_input}", source=source)
+            return await send_message_async(number=sender, message=f"❌ Couldn't find user: {new_assignee_input}", source=source)
 
         old_assignee = lead.assigned_to
         
         # Prevent reassigning to the same person
-        if old_assignee.lower() == assignee.username.lower():
-            # Corrected: send_message arguments
-            return send_message(number=sender, message=f"✅ Lead '{company_name}' is already assigned to {assignee.username}.", source=source)
+        if (old_assignee or "").casefold() == assignee.username.casefold():
+            return await send_message_async(number=sender, message=f"✅ Lead '{company_name}' is already assigned to {assignee.username}.", source=source)
 
-        lead.assigned_to = assignee.username
-        db.commit()
+        # Built before the commit below, which expires the lead, its contacts and the assignee.
+        # Numbers are compared after formatting so "+91..." and "91..." count as the same sender, and
+        # the notification text is only formatted when someone else will receive it.
+        assignee_name, assignee_number = assignee.username, assignee.usernumber
+        assignee_phone = format_phone(assignee_number) if assignee_number else None
+        notification_msg = None
+        if assignee_phone and assignee_phone != format_phone(sender):
+            primary_contact = lead.contacts[0] if lead.contacts else None
+            notification_msg = (
+                f"📢 You have been assigned a lead:\n\n"
+                f"🏢 Company: *{lead.company_name}*\n"
+                f"👤 Contact: {(primary_contact and primary_contact.contact_name) or 'N/A'}\n"
+                f"📞 Phone: {(primary_contact and primary_contact.phone) or 'N/A'}\n"
+                f"📊 Status: {lead.status or 'N/A'}\n"
+                f"🔄 Assigned By: {sender}"
+            )
 
-        assignment_log_data = AssignmentLogCreate(
-            lead_id=lead.id,
-            assigned_to=assignee.username,
-            assigned_by=str(sender)
-        )
-        create_assignment_log(db, log=assignment_log_data)
+        # The lead update and both log rows are committed together below.
+        lead.assigned_to = assignee.username
 
         activity_details = f"Lead reassigned from '{old_assignee}' to '{assignee.username}' by {sender}."
-        create_activity_log(db, activity=ActivityLogCreate(lead_id=lead.id, phase=lead.status, details=activity_details))
+        create_assignment_and_activity(
+            db, lead_id=lead.id, assigned_to=assignee.username, assigned_by=str(sender),
+            phase=lead.status, details=activity_details
+        )
+        db.commit()
 
         # --- REVISED NOTIFICATION AND RESPONSE LOGIC ---
 
         # 1. Independent Assignee Notification (always via WhatsApp)
-        if assignee.usernumber and assignee.usernumber != sender:
-            notification_msg = (
-                f"📢 You have been assigned a lead:\n\n"
-                f"🏢 Company: *{lead.company_name}*\n"
-                f"👤 Contact: {lead.contact_name or 'N/A'}\n"
-                f"📞 Phone: {lead.phone or 'N/A'}\n"
-                f"📊 Status: {lead.status or 'N/A'}\n"
-                f"🔄 Assigned By: {sender}"
-            )
-            # --- CRITICAL FIX: Corrected send_whatsapp_message call ---
-            send_whatsapp_message(number=format_phone(assignee.usernumber), message=notification_msg)
-            logger.info(f"Sent reassignment notification to {assignee.username} at {assignee.usernumber}")
+        if notification_msg:
+            # Sent in the background so the sender's confirmation is not held up by it.
+            send_in_background(send_whatsapp_message_async(number=assignee_phone, message=notification_msg, dedupe=True))
+            logger.info("Queued reassignment notification to %s at %s", assignee_name, assignee_number)
 
         # 2. Confirmation for the Original User (handles both app and WhatsApp)
-        confirmation_msg = f"✅ Lead '{company_name}' has been successfully reassigned to {assignee.username}."
-        # Corrected: send_message arguments
-        return send_message(number=sender, message=confirmation_msg, source=source)
+        confirmation_msg = f"✅ Lead '{company_name}' has been successfully reassigned to {assignee_name}."
+        return await send_message_async(number=sender, message=confirmation_msg, source=source)
 
     except Exception as e:
+        db.rollback()
         logger.error("❌ Error in handle_reassignment: %s", str(e), exc_info=True)
-        # Corrected: send_message arguments
-        return send_message(number=sender, message="❌ An internal error occurred while reassigning the lead.", source=source)
\ No newline at end of file
+        return await send_message_async(number=sender, message="❌ An internal error occurred while reassigning the lead.", source=source)
\ No newline at end of file
@@ -1,34 +1,86 @@
 # reminder_handler.py
 import re
+from functools import lru_cache
 from sqlalchemy.orm import Session
-from app.models import Reminder, Lead, User
-from app.message_sender import send_message
+from app.message_sender import send_message_async
 from app.crud import get_lead_by_company, get_user_by_phone, create_activity_log, create_reminder
 from app.schemas import ActivityLogCreate, ReminderCreate
 from datetime import datetime, timedelta, date, time
 import dateparser
+from dateparser.search import search_dates
 import logging
 # --- NEW: Import pytz for timezone handling ---
 import pytz
 
 logger = logging.getLogger(__name__)
 
+LOCAL_TIMEZONE = pytz.timezone('Asia/Kolkata')
+
+_LOG_ACTIVITY_RE = re.compile(r"add activity for\s+(?P<company>.+?),\s*(?P<details>.+)", re.IGNORECASE)
+# The greedy head makes this split on the LAST " for "/" with " in the message.
+_LAST_FOR_WITH_RE = re.compile(r"^(?P<head>.*) (?:for|with) (?P<company>.+)$", re.IGNORECASE | re.DOTALL)
+
+# search_dates is only worth calling when the text could hold a date: it contains
+# a digit, a relative/time-of-day word, or a weekday/month name (matched on the
+# first three letters so "fri", "friday" and "sept" all count).
+_DATE_HINT_WORDS = frozenset({
+    "today", "tomorrow", "tonight", "yesterday", "noon", "midnight",
+    "morning", "afternoon", "evening", "night", "am", "pm", "next",
+    "minute", "minutes", "min", "mins", "hour", "hours", "day", "days",
+    "week", "weeks", "weekend", "month", "months", "year", "years",
+})
+_DATE_HINT_PREFIXES = frozenset({
+    "mon", "tue", "wed", "thu", "fri", "sat", "sun",
+    "jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec",
+})
+_HAS_DIGIT = re.compile(r"\d").search
+_LETTER_WORD_RE = re.compile(r"[a-z]+")
+
+
+def _may_contain_date(text: str) -> bool:
+    if _HAS_DIGIT(text):
+        return True
+    return any(
+        word in _DATE_HINT_WORDS or word[:3] in _DATE_HINT_PREFIXES
+        for word in _LETTER_WORD_RE.findall(text.lower())
+    )
+
+# dateparser is slow (locale loading, many format attempts), and users repeat the
+# same phrases ("tomorrow at 5pm"), so both lookups below are memoised.
+DATEPARSE_CACHE_SIZE = 1024
+
+# Phrases whose result depends on the current time of day: relative offsets
+# ("in 2 hours", "tomorrow") and clock times, which roll over to the next day once
+# they have passed. Anything else ("friday", "25 oct") resolves the same all day.
+_WALL_CLOCK_RE = re.compile(
+    r"\b(?:in|after|within|ago|now|today|tonight|tomorrow|next|this|noon|midnight|"
+    r"morning|afternoon|evening|night|hours?|hrs?|min(?:ute)?s?|am|pm)\b|\d\s*(?:am|pm)\b|\d:\d",
+    re.IGNORECASE,
+)
+
+
+@lru_cache(maxsize=DATEPARSE_CACHE_SIZE)
+def _find_date_phrase(text: str) -> str | None:
+    """Returns the first date/time phrase in text. Only the matched substring is
+    kept, which does not depend on the current time, so text alone is the key."""
+    found_dates = search_dates(text, settings={'PREFER_DATES_FROM': 'future'})
+    return found_dates[0][0] if found_dates else None
+
+
+@lru_cache(maxsize=DATEPARSE_CACHE_SIZE)
+def _parse_reminder_time(time_str: str, relative_base: datetime) -> datetime | None:
+    return dateparser.parse(time_str, settings={'PREFER_DATES_FROM': 'future', 'RELATIVE_BASE': relative_base})
+
 def parse_reminder_details(text: str) -> tuple[str | None, str | None, str | None]:
-    text_lower = text.lower()
-    last_for_index = text_lower.rfind(" for ")
-    last_with_index = text_lower.rfind(" with ")
-    separator_index = max(last_for_index, last_with_index)
-    if separator_index == -1:
+    match = _LAST_FOR_WITH_RE.match(text)
+    if not match:
         return None, None, None
-    company_name = text[separator_index + 5:].strip()
-    message_and_time = text[:separator_index].replace("Remind me to", "").strip()
-    found_dates = dateparser.search.search_dates(message_and_time, settings={'PREFER_DATES_FROM': 'future'})
+    company_name = match.group("company").strip()
+    message_and_time = match.group("head").replace("Remind me to", "").strip()
     reminder_msg = message_and_time
-    time_str = None
-    if found_dates:
-        date_string_found, date_obj = found_dates[0]
-        time_str = date_string_found
-        reminder_msg = message_and_time.replace(date_string_found, "").strip()
+    time_str = _find_date_phrase(message_and_time) if _may_contain_date(message_and_time) else None
+    if time_str:
+        reminder_msg = message_and_time.replace(time_str, "").strip()
     return reminder_msg, company_name, time_str
 
 
@@ -37,31 +89,40 @@ async def handle_set_reminder(db: Session, message: str, sender: str, reply_url:
     Handles setting a reminder. Correctly converts local parsed time to UTC before saving.
     """
     try:
-        log_pattern = re.compile(r"add activity for\s+(?P<company>.+?),\s*(?P<details>.+)", re.IGNORECASE)
-        log_match = log_pattern.search(message)
-        if log_match:
+        # Cheap substring tests run first; each regex below needs its literal to match at all.
+        lowered = message.lower()
+        if "add activity for" in lowered and (log_match := _LOG_ACTIVITY_RE.search(message)):
             lead = get_lead_by_company(db, log_match.group('company').strip())
             if not lead:
-                return send_message(number=sender, message=f"⚠️ Could not find lead: {log_match.group('company').strip()}", source=source)
+                return await send_message_async(number=sender, message=f"⚠️ Could not find lead: {log_match.group('company').strip()}", source=source)
             user = get_user_by_phone(db, sender)
             log_details = f"{log_match.group('details').strip()} - Logged by {user.username if user else sender}"
             create_activity_log(db, ActivityLogCreate(lead_id=lead.id, phase=lead.status, details=log_details,activity_type="Call"))
-            return send_message(number=sender, message=f"✅ Activity logged for *{lead.company_name}*.", source=source)
+            return await send_message_async(number=sender, message=f"✅ Activity logged for *{lead.company_name}*.", source=source)
 
-        reminder_msg, lead_name, time_str = parse_reminder_details(message)
+        if " for " in lowered or " with " in lowered:
+            reminder_msg, lead_name, time_str = parse_reminder_details(message)
+        else:
+            reminder_msg = lead_name = time_str = None
 
         if not reminder_msg or not lead_name:
             error_msg = "⚠️ Invalid format. Use: `Remind me to [action] for [Company] on [Date/Time]` or `Add activity for [Company], [details]`"
-            return send_message(number=sender, message=error_msg, source=source)
+            return await send_message_async(number=sender, message=error_msg, source=source)
 
         remind_time_local_naive = None
         default_scheduled = False
 
         if time_str:
-            remind_time_local_naive = dateparser.parse(time_str, settings={'PREFER_DATES_FROM': 'future', 'RELATIVE_BASE': datetime.now()})
+            # The base is part of the cache key, so it is kept as coarse as the phrase allows:
+            # start of today for plain dates, the current minute for wall-clock phrases.
+            if _WALL_CLOCK_RE.search(time_str):
+                relative_base = datetime.now().replace(second=0, microsecond=0)
+            else:
+                relative_base = datetime.combine(date.today(), time(0))
+            remind_time_local_naive = _parse_reminder_time(time_str, relative_base)
             if not remind_time_local_naive:
                 error_msg = f"❌ I couldn't understand the date or time: '{time_str}'. Please be more specific."
-                return send_message(number=sender, message=error_msg, source=source)
+                return await send_message_async(number=sender, message=error_msg, source=source)
         else:
             today = date.today()
             tomorrow = today + timedelta(days=1)
@@ -70,21 +131,20 @@ async def handle_set_reminder(db: Session, message: str, sender: str, reply_url:
 
         lead = get_lead_by_company(db, lead_name)
         if not lead:
-            return send_message(number=sender, message=f"⚠️ Could not find lead: '{lead_name}'", source=source)
+            return await send_message_async(number=sender, message=f"⚠️ Could not find lead: '{lead_name}'", source=source)
         
         user = get_user_by_phone(db, sender)
         if not user:
-            return send_message(number=sender, message="⚠️ You are not recognized in the system. Cannot set reminder.", source=source)
+            return await send_message_async(number=sender, message="⚠️ You are not recognized in the system. Cannot set reminder.", source=source)
 
         # --- THIS IS THE FIX ---
         # Convert the parsed local time to a naive UTC time for database storage
         try:
-            local_tz = pytz.timezone('Asia/Kolkata') # Your local timezone
-            remind_time_local_aware = local_tz.localize(remind_time_local_naive)
+            remind_time_local_aware = LOCAL_TIMEZONE.localize(remind_time_local_naive)
             remind_time_utc_aware = remind_time_local_aware.astimezone(pytz.utc)
             remind_time_utc_naive = remind_time_utc_aware.replace(tzinfo=None)
         except Exception as e:
-            logger.error(f"Timezone conversion failed in reminder_handler: {e}. Falling back to naive time.")
+            logger.error("Timezone conversion failed in reminder_handler: %s. Falling back to naive time.", e)
             remind_time_utc_naive = remind_time_local_naive
 
         create_reminder(db, ReminderCreate(
@@ -102,9 +162,9 @@ async def handle_set_reminder(db: Session, message: str, sender: str, reply_url:
         if default_scheduled:
             success_msg += " (Default time used as none was provided)."
             
-        return send_message(number=sender, message=success_msg, source=source)
+        return await send_message_async(number=sender, message=success_msg, source=source)
 
     except Exception as e:
         db.rollback()
-        logger.error(f"❌ Error setting reminder: {e}", exc_info=True)
-        return send_message(number=sender, message="❌ An internal error occurred while setting the reminder.", source=source)
\ No newline at end of file
+        logger.error("❌ Error setting reminder: %s", e, exc_info=True)
+        return await send_message_async(number=sender, message="❌ An internal error occurred while setting the reminder.", source=source)
\ No newline at end of file
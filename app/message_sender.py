@@ -1,9 +1,22 @@
 # app/message_sender.py
 import os
-from typing import Union
+import mimetypes
+import asyncio
+import atexit
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Callable, Optional, Union
+from urllib.parse import urlencode
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+import random
 import time
 from dotenv import load_dotenv
+from app.temp_store import ContextStore
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,15 +31,156 @@ WHATSIFY_ACCOUNT_ID = os.getenv("WHATSIFY_ACCOUNT_ID") # This is your WhatsFlyAc
 # For example: BASE_URL=https://your-ngrok-or-domain.com
 BASE_URL = os.getenv("BASE_URL", "http://157.20.215.187:7200") # Replace default with your ngrok url if it changes
 
+# These do not change after load_dotenv, so they are checked and derived once here.
+WHATSIFY_CONFIGURED = bool(WHATSIFY_API_URL and WHATSIFY_API_KEY and WHATSIFY_ACCOUNT_ID)
+if not WHATSIFY_CONFIGURED:
+    logger.warning("❗ Whatsify API credentials or URL are not set in .env file; WhatsApp sends will fail.")
+_BASE_URL_STRIPPED = (BASE_URL or "").rstrip("/")
+# When set, media files are uploaded in the send request instead of Whatsify
+# downloading them back from BASE_URL's public preview route.
+WHATSIFY_DIRECT_UPLOAD = os.getenv("WHATSIFY_DIRECT_UPLOAD", "").lower() in ("1", "true", "yes")
+_BASE_PAYLOAD = MappingProxyType({"secret": WHATSIFY_API_KEY, "account": WHATSIFY_ACCOUNT_ID})
+
+# Whatsify response bodies are only logged on errors, and then only this much of them.
+LOGGED_RESPONSE_CHARS = 200
+
+def _redact(secret: Optional[str]) -> str:
+    """Keeps just enough of a credential to tell which one is configured."""
+    return f"{secret[:4]}…{secret[-2:]}" if secret else "<unset>"
+
+logger.debug("Whatsify API URL: '%s', account: '%s', key: '%s'", WHATSIFY_API_URL, WHATSIFY_ACCOUNT_ID, _redact(WHATSIFY_API_KEY))
+
 MAX_RETRIES = 3
-RETRY_DELAY = 5  
+# Retries back off exponentially from RETRY_BASE_DELAY with random jitter, so a
+# burst of failed sends does not hit Whatsify again in lockstep.
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8
+# Only timeouts, rate limiting and transient gateway/server errors are retried;
+# other failures (bad key, bad number, 501...) will not succeed on a second try.
+RETRYABLE_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+# Form bodies are encoded once per message and reused by every retry.
+_FORM_HEADERS = MappingProxyType({"Content-Type": "application/x-www-form-urlencoded"})
+
+def _retry_delay(attempt: int, response=None) -> float:
+    """
+    Seconds to wait after a failed attempt. Honours a numeric Retry-After from
+    Whatsify; otherwise uses decorrelated jitter around an exponential backoff.
+    """
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), RETRY_MAX_DELAY)
+    backoff = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    return min(RETRY_MAX_DELAY, random.uniform(RETRY_BASE_DELAY, backoff * 3))
+
+class CircuitBreaker:
+    """
+    Fails sends fast while Whatsify is down. After fail_threshold sends in a row
+    have exhausted their retries, the circuit opens and sends return False at once;
+    after reset_after seconds a single trial send is let through (half-open), and
+    its outcome closes or re-opens the circuit.
+    """
+    def __init__(self, fail_threshold=5, reset_after=30):
+        self.fail_threshold = fail_threshold
+        self.reset_after = reset_after
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_after:
+                self.state = "half_open"
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.fail_threshold:
+                if self.state != "open":
+                    logger.error("⛔ Whatsify circuit opened after %s failed sends; pausing sends for %ss.", self.failures, self.reset_after)
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+whatsify_circuit = CircuitBreaker()
+
+HTTP_POOL_CONNECTIONS = 32
+HTTP_POOL_MAXSIZE = 64
+
+# Shared by the sync senders so consecutive messages reuse keep-alive connections
+# instead of paying DNS + TLS setup on every call. Retries stay in the send loops.
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter)
+atexit.register(_session.close)
+
+# Worker threads for fire-and-forget sends from the synchronous web endpoints;
+# the async handlers use send_in_background instead. Registered after the session
+# close so pending sends drain before the session goes away.
+WHATSAPP_SEND_WORKERS = 16
+_send_pool = ThreadPoolExecutor(max_workers=WHATSAPP_SEND_WORKERS, thread_name_prefix="whatsify")
+atexit.register(_send_pool.shutdown, wait=True)
+
+# The async senders' counterpart of _session.
+_async_client: Optional[httpx.AsyncClient] = None
+
+def _get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(
+            timeout=10,
+            limits=httpx.Limits(max_connections=HTTP_POOL_MAXSIZE, max_keepalive_connections=HTTP_POOL_CONNECTIONS),
+        )
+    return _async_client
+
+# Caps concurrent async posts so a burst of background notifications does not
+# trip Whatsify's rate limiting.
+WHATSAPP_MAX_CONCURRENT_SENDS = 8
+_send_semaphore = asyncio.Semaphore(WHATSAPP_MAX_CONCURRENT_SENDS)
 
+# Strong references to in-flight fire-and-forget sends; the event loop only
+# keeps weak references to tasks, so an unreferenced task can be collected mid-send.
+_background_tasks = set()
+
+def send_in_background(coro) -> asyncio.Task:
+    """
+    Schedules an async send (e.g. an assignee notification) without waiting for it,
+    so the caller's reply is not held up by its latency or retries.
+    """
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+async def close_async_client():
+    """Waits for pending background sends, then closes the shared httpx client. Called on application shutdown."""
+    global _async_client
+    if _background_tasks:
+        await asyncio.gather(*_background_tasks, return_exceptions=True)
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+_PHONE_PUNCTUATION = str.maketrans("", "", " \t-()")
+
+@lru_cache(maxsize=4096)
 def format_phone(phone: Union[str, int]) -> str:
     """
     Formats a phone number to include a leading '+' and country code '91' if missing.
     Removes spaces, hyphens, and parentheses for consistent formatting.
+    The result depends only on the input, so it is cached per number.
     """
-    phone_str = str(phone).strip().replace(" ", "").replace("-", "").replace("(", "").replace(")", "")
+    phone_str = str(phone).strip().translate(_PHONE_PUNCTUATION)
     
     if phone_str.startswith('+'):
         return phone_str
@@ -35,86 +189,230 @@ def format_phone(phone: Union[str, int]) -> str:
     else:
         return '+91' + phone_str
 
+APP_SOURCE = "app"
+
+def is_app_source(source: str) -> bool:
+    """
+    True when the reply goes back to the web app instead of WhatsApp.
+    route_message normalises source on entry, so the plain comparison is the usual path.
+    """
+    return source == APP_SOURCE or source.strip().lower() == APP_SOURCE
+
 def app_reply_json(message: str, source: str) -> dict:
     """
     Generates a specific JSON response for messages originating from an 'app' source.
     This function is used when the message is not meant for external sending but
     for internal application handling.
     """
-    if source.strip().lower() == "app":
+    if is_app_source(source):
         logger.info("✅ Using app-specific message sending logic for source 'app'")
         data = {"status": "success", "reply": message}
         return data
-    logger.warning(f"❗ 'app_reply_json' called with non-'app' source: '{source}'. Returning error.")
+    logger.warning("❗ 'app_reply_json' called with non-'app' source: '%s'. Returning error.", source)
     return {"status": "error", "reply": "Invalid source for app response"}
 
+# Notifications sent with dedupe=True are skipped when the same text already went to the
+# same number within this window (refresh loops, double-tapped buttons). 0 turns it off.
+DEDUP_WINDOW_SECONDS = int(os.getenv("DEDUP_WINDOW_SECONDS", "60"))
+_recent_sends = ContextStore(maxsize=10000, ttl=DEDUP_WINDOW_SECONDS)
+
+def _dedupe_key(formatted_number: str, message: str) -> Optional[tuple]:
+    if DEDUP_WINDOW_SECONDS <= 0:
+        return None
+    return formatted_number, hashlib.blake2b(message.encode(), digest_size=8).digest()
+
+def _send_app_reply(number: str, message: str) -> dict:
+    logger.info("✅ Using app-specific message sending logic for source 'app'")
+    return {"status": "success", "reply": message}
+
+def _send_whatsapp_reply(number: str, message: str) -> dict:
+    success = send_whatsapp_message(number, message)
+    if success:
+        logger.info("Successfully sent WhatsApp message to %s.", number)
+        return {"status": "success", "sent": True, "reply": message}
+    else:
+        logger.error("Failed to send WhatsApp message to %s.", number)
+        return {"status": "error", "sent": False, "reply": "Failed to send message"}
+
+# Reply senders keyed by normalised source; anything else goes out over WhatsApp.
+_SENDERS: dict[str, Callable[[str, str], dict]] = {
+    APP_SOURCE: _send_app_reply,
+    "whatsapp": _send_whatsapp_reply,
+}
+
 def send_message(number: str, message: str, source: str = "whatsapp") -> dict:
     """
     Routes message sending based on the specified source.
     If the source is 'app', it uses the app-specific reply logic.
     Otherwise (e.g., 'whatsapp'), it attempts to send a WhatsApp message via Whatsify.
     """
-    if source.strip().lower() == "app":
-        return app_reply_json(message, source)
-    else:
-        logger.info(f"Attempting to send message via WhatsApp for source: '{source}'")
-        success = send_whatsapp_message(number, message) 
-        if success:
-            logger.info(f"Successfully sent WhatsApp message to {number}.")
-            return {"status": "success", "sent": True, "reply": message}
-        else:
-            logger.error(f"Failed to send WhatsApp message to {number}.")
-            return {"status": "error", "sent": False, "reply": "Failed to send message"}
+    sender = _SENDERS.get(source) or _SENDERS.get(source.strip().lower(), _send_whatsapp_reply)
+    if sender is _send_whatsapp_reply:
+        logger.info("Attempting to send message via WhatsApp for source: '%s'", source)
+    return sender(number, message)
 
 
-def send_whatsapp_message(number: str, message: str) -> bool:
+def send_whatsapp_message(number: str, message: str, dedupe: bool = False) -> bool:
     """
     Sends a WhatsApp TEXT message using the Whatsify API,
     conforming to the multipart/form-data requirements.
+    Pass dedupe=True for notifications that should not repeat within DEDUP_WINDOW_SECONDS.
     """
     formatted_number = format_phone(number)
-    logger.info(f"📤 Attempting to send WhatsApp TEXT message to {formatted_number}: '{message}' via Whatsify")
+    dedupe_key = _dedupe_key(formatted_number, message) if dedupe else None
+    if dedupe_key is not None and dedupe_key in _recent_sends:
+        logger.info("⏭️ Skipping WhatsApp message to %s: the same text was sent in the last %ss.", formatted_number, DEDUP_WINDOW_SECONDS)
+        return True
+    logger.info("📤 Attempting to send WhatsApp TEXT message to %s: '%s' via Whatsify", formatted_number, message)
 
     target_url = WHATSIFY_API_URL
 
-    if not all([target_url, WHATSIFY_API_KEY, WHATSIFY_ACCOUNT_ID]):
+    if not WHATSIFY_CONFIGURED:
         logger.error("❌ Cannot send WhatsApp message: Whatsify API credentials or URL are not set in .env file.")
         return False
 
-    logger.debug(f"Whatsify API URL being used: '{target_url}'")
-    logger.debug(f"Whatsify API Key (from .env): '{WHATSIFY_API_KEY}'")
-    logger.debug(f"Whatsify Account ID (from .env): '{WHATSIFY_ACCOUNT_ID}'")
+    if not whatsify_circuit.allow():
+        logger.warning("⛔ Whatsify circuit is open; not sending to %s.", formatted_number)
+        return False
 
     payload_data = {
-        "secret": WHATSIFY_API_KEY,
-        "account": WHATSIFY_ACCOUNT_ID,
+        **_BASE_PAYLOAD,
         "recipient": formatted_number,
         "message": message,
         "type": "text",
     }
 
-    logger.debug(f"Whatsify API Request Payload (form data): {payload_data}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Whatsify API Request Payload (form data): %s", {**payload_data, "secret": _redact(WHATSIFY_API_KEY)})
 
+    body = urlencode(payload_data).encode()
     for attempt in range(1, MAX_RETRIES + 1):
+        response = None
         try:
-            response = requests.post(target_url, data=payload_data, timeout=10)
-            logger.info(f"📤 Attempt {attempt} to Whatsify: Status Code {response.status_code} - Response: {response.text}")
+            response = _session.post(target_url, data=body, headers=_FORM_HEADERS, timeout=10)
+            logger.info("📤 Attempt %s to Whatsify: Status Code %s", attempt, response.status_code)
 
             if 200 <= response.status_code < 300:
-                logger.info(f"✅ Successfully sent or accepted WhatsApp TEXT message to {formatted_number}.")
+                whatsify_circuit.record_success()
+                logger.info("✅ Successfully sent or accepted WhatsApp TEXT message to %s.", formatted_number)
+                if dedupe_key is not None:
+                    _recent_sends[dedupe_key] = True
                 return True
             else:
-                logger.error(f"❌ Error from Whatsify API on attempt {attempt}: {response.text}")
-                if response.status_code < 500: # Don't retry client errors (4xx)
+                logger.error("❌ Error from Whatsify API on attempt %s: %s", attempt, response.text[:LOGGED_RESPONSE_CHARS])
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    # Whatsify answered, so it is up; only this request was rejected.
+                    whatsify_circuit.record_success()
                     break
         except requests.RequestException as e:
-            logger.error(f"❌ RequestException on attempt {attempt}: {e}")
+            logger.error("❌ RequestException on attempt %s: %s", attempt, e)
 
-        time.sleep(RETRY_DELAY)
+        if attempt < MAX_RETRIES:
+            time.sleep(_retry_delay(attempt, response))
+    else:
+        # Every attempt hit a network error or a retryable status.
+        whatsify_circuit.record_failure()
 
     logger.error("🚫 All attempts to send WhatsApp TEXT message failed.")
     return False
 
+async def send_message_async(number: str, message: str, source: str = "whatsapp") -> dict:
+    """
+    Async counterpart of send_message for use inside handlers, so the event loop
+    is not blocked while the Whatsify API responds.
+    """
+    if is_app_source(source):
+        return app_reply_json(message, source)
+    logger.info("Attempting to send message via WhatsApp for source: '%s'", source)
+    success = await send_whatsapp_message_async(number, message)
+    if success:
+        logger.info("Successfully sent WhatsApp message to %s.", number)
+        return {"status": "success", "sent": True, "reply": message}
+    logger.error("Failed to send WhatsApp message to %s.", number)
+    return {"status": "error", "sent": False, "reply": "Failed to send message"}
+
+async def send_whatsapp_message_async(number: str, message: str, dedupe: bool = False) -> bool:
+    """
+    Async counterpart of send_whatsapp_message, using the shared httpx client.
+    Retries follow the same rules: RETRYABLE_STATUS_CODES and network errors are retried, anything else is not.
+    """
+    formatted_number = format_phone(number)
+    dedupe_key = _dedupe_key(formatted_number, message) if dedupe else None
+    if dedupe_key is not None and dedupe_key in _recent_sends:
+        logger.info("⏭️ Skipping WhatsApp message to %s: the same text was sent in the last %ss.", formatted_number, DEDUP_WINDOW_SECONDS)
+        return True
+    logger.info("📤 Attempting to send WhatsApp TEXT message to %s: '%s' via Whatsify", formatted_number, message)
+
+    if not WHATSIFY_CONFIGURED:
+        logger.error("❌ Cannot send WhatsApp message: Whatsify API credentials or URL are not set in .env file.")
+        return False
+
+    if not whatsify_circuit.allow():
+        logger.warning("⛔ Whatsify circuit is open; not sending to %s.", formatted_number)
+        return False
+
+    payload_data = {
+        **_BASE_PAYLOAD,
+        "recipient": formatted_number,
+        "message": message,
+        "type": "text",
+    }
+
+    body = urlencode(payload_data).encode()
+    client = _get_async_client()
+    for attempt in range(1, MAX_RETRIES + 1):
+        response = None
+        try:
+            async with _send_semaphore:
+                response = await client.post(WHATSIFY_API_URL, content=body, headers=_FORM_HEADERS)
+            logger.info("📤 Attempt %s to Whatsify: Status Code %s", attempt, response.status_code)
+
+            if 200 <= response.status_code < 300:
+                whatsify_circuit.record_success()
+                logger.info("✅ Successfully sent or accepted WhatsApp TEXT message to %s.", formatted_number)
+                if dedupe_key is not None:
+                    _recent_sends[dedupe_key] = True
+                return True
+            logger.error("❌ Error from Whatsify API on attempt %s: %s", attempt, response.text[:LOGGED_RESPONSE_CHARS])
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                # Whatsify answered, so it is up; only this request was rejected.
+                whatsify_circuit.record_success()
+                break
+        except httpx.HTTPError as e:
+            logger.error("❌ HTTPError on attempt %s: %s", attempt, e)
+
+        if attempt < MAX_RETRIES:
+            await asyncio.sleep(_retry_delay(attempt, response))
+    else:
+        # Every attempt hit a network error or a retryable status.
+        whatsify_circuit.record_failure()
+
+    logger.error("🚫 All attempts to send WhatsApp TEXT message failed.")
+    return False
+
+async def send_many(items: list[tuple[str, str]], dedupe: bool = False) -> list:
+    """
+    Sends several WhatsApp TEXT messages concurrently, for bulk notifications.
+    In-flight requests are capped by the shared send semaphore, so N messages take
+    roughly N / WHATSAPP_MAX_CONCURRENT_SENDS round trips instead of N.
+    Returns one result per (number, message) pair, in order: True/False, or the
+    exception a send raised.
+    """
+    return await asyncio.gather(
+        *(send_whatsapp_message_async(number, message, dedupe=dedupe) for number, message in items),
+        return_exceptions=True,
+    )
+
+# Attachments with these extensions are sent as Whatsify "document" messages; anything else as "media".
+DOCUMENT_EXTENSIONS = frozenset({'.pdf', '.doc', '.docx', '.xls', '.xlsx', '.csv', '.txt', '.ppt', '.pptx'})
+
+def submit_whatsapp_message(number: str, message: str) -> Future:
+    """
+    Queues a WhatsApp TEXT message on the send pool and returns at once, for
+    notifications where the caller does not need to wait for Whatsify.
+    """
+    return _send_pool.submit(send_whatsapp_message, number, message, dedupe=True)
+
 def send_whatsapp_message_with_media(number: str, file_path: str, caption: str, message_type: str) -> bool:
     """
     Sends a WhatsApp message with a media or document attachment.
@@ -127,61 +425,85 @@ def send_whatsapp_message_with_media(number: str, file_path: str, caption: str,
 
     target_url = WHATSIFY_API_URL
 
-    if not all([target_url, WHATSIFY_API_KEY, WHATSIFY_ACCOUNT_ID, BASE_URL]):
+    if not (WHATSIFY_CONFIGURED and (WHATSIFY_DIRECT_UPLOAD or _BASE_URL_STRIPPED)):
         logger.error("❌ Cannot send WhatsApp media: Whatsify credentials, URL, or BASE_URL are not set in .env file.")
         return False
 
-    document_extensions = ['.pdf', '.doc', '.docx', '.xls', '.xlsx', '.csv', '.txt', '.ppt', '.pptx']
-    _, file_extension = os.path.splitext(file_path.lower())
+    if not whatsify_circuit.allow():
+        logger.warning("⛔ Whatsify circuit is open; not sending media to %s.", formatted_number)
+        return False
+
+    if WHATSIFY_DIRECT_UPLOAD and not os.path.isfile(file_path):
+        logger.error("❌ Cannot upload WhatsApp media: file not found at %s", file_path)
+        return False
 
-    correct_message_type = "document" if file_extension in document_extensions else "media"
+    file_extension = os.path.splitext(file_path)[1].lower()
+
+    correct_message_type = "document" if file_extension in DOCUMENT_EXTENSIONS else "media"
     
-    logger.info(f"📤 Attempting to send WhatsApp {correct_message_type.upper()} to {formatted_number} via Whatsify (Original type was '{message_type}')")
+    logger.info("📤 Attempting to send WhatsApp %s to %s via Whatsify (Original type was '%s')", correct_message_type.upper(), formatted_number, message_type)
     
     # --- START OF THE CRITICAL FIX ---
     # The problem was here. We must extract ONLY the filename from the full local path.
     # For example, from 'D:\\Indus_CRM\\...\\report.pdf', we need just 'report.pdf'.
     file_name = os.path.basename(file_path)
-    public_file_url = f"{BASE_URL.rstrip('/')}/web/attachments/preview/{file_name}"
     # --- END OF THE CRITICAL FIX ---
 
-    logger.info(f"Using public file URL for WhatsApp: {public_file_url}")
-
     # Base payload required for all media/document types
     payload_data = {
-        "secret": WHATSIFY_API_KEY,
-        "account": WHATSIFY_ACCOUNT_ID,
+        **_BASE_PAYLOAD,
         "recipient": formatted_number,
         "caption": caption,
         "type": correct_message_type,
         "message": caption # API requires this field even for media/docs
     }
-
-    # Add parameters specific to the message type
     if correct_message_type == 'document':
-        payload_data['document_url'] = public_file_url
         payload_data['document_name'] = file_name
+
+    # Either upload the file with the request, or point Whatsify at our public preview URL to fetch it.
+    if WHATSIFY_DIRECT_UPLOAD:
+        upload_field = f"{correct_message_type}_file"
+        mime_type = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+        logger.info("Uploading %s directly to Whatsify as '%s'", file_name, upload_field)
     else:
-        payload_data['media_url'] = public_file_url
+        public_file_url = f"{_BASE_URL_STRIPPED}/web/attachments/preview/{file_name}"
+        payload_data[f"{correct_message_type}_url"] = public_file_url
+        logger.info("Using public file URL for WhatsApp: %s", public_file_url)
     
-    logger.debug(f"Whatsify API Request Payload (form data): {payload_data}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Whatsify API Request Payload (form data): %s", {**payload_data, "secret": _redact(WHATSIFY_API_KEY)})
 
+    # Multipart uploads need the fields as a dict; the URL flow posts a pre-encoded form.
+    body = None if WHATSIFY_DIRECT_UPLOAD else urlencode(payload_data).encode()
     for attempt in range(1, MAX_RETRIES + 1):
+        response = None
         try:
-            response = requests.post(target_url, data=payload_data, timeout=20)
-            logger.info(f"📤 Attempt {attempt} to Whatsify ({correct_message_type.upper()}): Status {response.status_code} - Response: {response.text}")
+            if WHATSIFY_DIRECT_UPLOAD:
+                # Reopened per attempt so a retry uploads the file from the start.
+                with open(file_path, "rb") as fh:
+                    response = _session.post(target_url, data=payload_data, files={upload_field: (file_name, fh, mime_type)}, timeout=20)
+            else:
+                response = _session.post(target_url, data=body, headers=_FORM_HEADERS, timeout=20)
+            logger.info("📤 Attempt %s to Whatsify (%s): Status %s", attempt, correct_message_type.upper(), response.status_code)
 
             if 200 <= response.status_code < 300:
-                logger.info(f"✅ Successfully sent or accepted WhatsApp {correct_message_type.upper()} to {formatted_number}.")
+                whatsify_circuit.record_success()
+                logger.info("✅ Successfully sent or accepted WhatsApp %s to %s.", correct_message_type.upper(), formatted_number)
                 return True
             else:
-                logger.error(f"❌ Error from Whatsify API on attempt {attempt}: {response.text}")
-                if response.status_code < 500:
+                logger.error("❌ Error from Whatsify API on attempt %s: %s", attempt, response.text[:LOGGED_RESPONSE_CHARS])
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    # Whatsify answered, so it is up; only this request was rejected.
+                    whatsify_circuit.record_success()
                     break
         except requests.RequestException as e:
-            logger.error(f"❌ RequestException on attempt {attempt}: {e}")
+            logger.error("❌ RequestException on attempt %s: %s", attempt, e)
 
-        time.sleep(RETRY_DELAY)
-    
-    logger.error(f"🚫 All attempts to send WhatsApp {correct_message_type.upper()} message failed.")
+        if attempt < MAX_RETRIES:
+            time.sleep(_retry_delay(attempt, response))
+    else:
+        # Every attempt hit a network error or a retryable status.
+        whatsify_circuit.record_failure()
+
+    logger.error("🚫 All attempts to send WhatsApp %s message failed.", correct_message_type.upper())
     return False  
\ No newline at end of file
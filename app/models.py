@@ -1,7 +1,7 @@
 # app/models.py
 import enum
 from datetime import datetime, date
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, Date
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, Date, Index, text
 from sqlalchemy.orm import relationship
 from app.db import Base
 
@@ -34,7 +34,7 @@ class TaskStatus(str, enum.Enum):
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    username = Column(String(100), nullable=False)
+    username = Column(String(100), nullable=False, index=True)
     company_name = Column(String(100), nullable=False, index=True)
     usernumber = Column(String(15), unique=True, nullable=False)
     email = Column("Email", String(100), nullable=True)
@@ -51,65 +51,76 @@ class Contact(Base):
     __tablename__ = "contacts"
     id = Column(Integer, primary_key=True, index=True)
     lead_id = Column(Integer, ForeignKey("leads.id"), nullable=False)
-    contact_name = Column(String, nullable=True)
-    phone = Column(String, nullable=True)
-    email = Column(String, nullable=True)
-    designation = Column(String, nullable=True)
-    linkedIn = Column(String, nullable=True)
-    pan = Column(String, nullable=True)
+    contact_name = Column(String(255), nullable=True)
+    phone = Column(String(50), nullable=True)
+    email = Column(String(254), nullable=True)
+    designation = Column(String(100), nullable=True)
+    linkedIn = Column(String(512), nullable=True)
+    pan = Column(String(20), nullable=True)
     lead = relationship("Lead", back_populates="contacts")
 
 class Lead(Base):
     __tablename__ = "leads"
+    # Per-user reports filter leads by assignee and creation date; the composite also
+    # serves plain assigned_to lookups, so that column needs no index of its own.
+    # The lead lists read only active leads, newest first; soft-deleted rows stay out
+    # of the filtered index.
+    __table_args__ = (
+        Index("ix_leads_assignee_created", "assigned_to", "created_at"),
+        Index("ix_leads_active_created", "created_at", mssql_where=text("isActive = 1")),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    company_name = Column(String, nullable=False)
-    source = Column(String, nullable=False)
-    created_by = Column(String, nullable=False)
-    assigned_to = Column(String, ForeignKey("users.username"), nullable=False)
-    email = Column(String, nullable=True)
-    website = Column(String, nullable=True)
-    linkedIn = Column(String, nullable=True)
-    address = Column(String, nullable=True)
-    address_2 = Column(String, nullable=True)
-    city = Column(String, nullable=True)
-    state = Column(String, nullable=True)
-    pincode = Column(String, nullable=True)
-    country = Column(String, nullable=True)
-    segment = Column(String, nullable=True)
-    verticles = Column(String, nullable=True)
-    team_size = Column(String, nullable=True)
+    company_name = Column(String(255), nullable=False, index=True)
+    source = Column(String(100), nullable=False)
+    created_by = Column(String(100), nullable=False, index=True)
+    assigned_to = Column(String(100), ForeignKey("users.username"), nullable=False)
+    email = Column(String(254), nullable=True)
+    website = Column(String(512), nullable=True)
+    linkedIn = Column(String(512), nullable=True)
+    address = Column(String(500), nullable=True)
+    address_2 = Column(String(500), nullable=True)
+    city = Column(String(100), nullable=True)
+    state = Column(String(100), nullable=True)
+    pincode = Column(String(20), nullable=True)
+    country = Column(String(100), nullable=True)
+    segment = Column(String(100), nullable=True)
+    verticles = Column(String(100), nullable=True)
+    team_size = Column(String(50), nullable=True)
     remark = Column(Text, nullable=True)
-    status = Column(String, default="new")
-    lead_type = Column(String, nullable=True)
-    phone_2 = Column(String, nullable=True)
-    turnover = Column(String, nullable=True)
-    current_system = Column(String, nullable=True)
+    status = Column(String(50), default="new", index=True)
+    lead_type = Column(String(50), nullable=True)
+    phone_2 = Column(String(50), nullable=True)
+    turnover = Column(String(100), nullable=True)
+    current_system = Column(String(255), nullable=True)
     machine_specification = Column(Text, nullable=True)
     challenges = Column(Text, nullable=True)
-    opportunity_business = Column(String, nullable=True)
+    opportunity_business = Column(String(255), nullable=True)
     target_closing_date = Column(Date, nullable=True)
-    version = Column(String, nullable=True)
-    database_type = Column(String, nullable=True)
-    amc = Column(String, nullable=True)
-    gst = Column(String, nullable=True)
-    company_pan = Column(String, nullable=True)
+    version = Column(String(50), nullable=True)
+    database_type = Column(String(100), nullable=True)
+    amc = Column(String(100), nullable=True)
+    gst = Column(String(50), nullable=True)
+    company_pan = Column(String(20), nullable=True)
     isActive = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     contacts = relationship("Contact", back_populates="lead", cascade="all, delete-orphan")
     assigned_to_user = relationship("User", back_populates="leads")
-    reminders = relationship("Reminder", foreign_keys='Reminder.lead_id', back_populates="lead")
-    events = relationship("Event", foreign_keys='Event.lead_id', back_populates="lead")
-    demos = relationship("Demo", foreign_keys='Demo.lead_id', back_populates="lead")
-    activities = relationship("ActivityLog", back_populates="lead")
     attachments = relationship("LeadAttachment", back_populates="lead", cascade="all, delete-orphan")
-    task_history = relationship("TaskHistory", back_populates="lead")
-    AssignmentLogs = relationship("AssignmentLog", back_populates="lead")
-    drip_assignments = relationship("LeadDripAssignment", back_populates="lead")
-    tasks = relationship("Task", back_populates="lead")
-    meetings = relationship("Meeting", back_populates="lead")
-    feedbacks = relationship("Feedback", back_populates="lead")
+    # Collections nothing iterates per lead (they're queried by lead_id instead):
+    # lazy-loading them raises, so a new caller has to opt in with selectinload()
+    # instead of adding a query per lead.
+    reminders = relationship("Reminder", foreign_keys='Reminder.lead_id', back_populates="lead", lazy="raise_on_sql")
+    events = relationship("Event", foreign_keys='Event.lead_id', back_populates="lead", lazy="raise_on_sql")
+    demos = relationship("Demo", foreign_keys='Demo.lead_id', back_populates="lead", lazy="raise_on_sql")
+    activities = relationship("ActivityLog", back_populates="lead", lazy="raise_on_sql")
+    task_history = relationship("TaskHistory", back_populates="lead", lazy="raise_on_sql")
+    AssignmentLogs = relationship("AssignmentLog", back_populates="lead", lazy="raise_on_sql")
+    drip_assignments = relationship("LeadDripAssignment", back_populates="lead", lazy="raise_on_sql")
+    tasks = relationship("Task", back_populates="lead", lazy="raise_on_sql")
+    meetings = relationship("Meeting", back_populates="lead", lazy="raise_on_sql")
+    feedbacks = relationship("Feedback", back_populates="lead", lazy="raise_on_sql")
 
 class LeadAttachment(Base):
     __tablename__ = "lead_attachments"
@@ -125,6 +136,8 @@ class LeadAttachment(Base):
     
 class ActivityLog(Base):
     __tablename__ = "activity_logs"
+    # A lead's activity is always read newest first (history, last-activity lookup).
+    __table_args__ = (Index("ix_activity_logs_lead_created", "lead_id", "created_at"),)
     id = Column(Integer, primary_key=True, index=True)
     lead_id = Column(Integer, ForeignKey("leads.id"), nullable=False)
     activity_type = Column(String, nullable=False, default="Call")
@@ -136,33 +149,41 @@ class ActivityLog(Base):
 
 class Event(Base):
     __tablename__ = "events"
+    __table_args__ = (
+        Index("ix_events_lead_phase", "lead_id", "phase"),
+        Index("ix_events_lead_time", "lead_id", "event_time"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     lead_id = Column(Integer, ForeignKey("leads.id"), nullable=True)
     proposal_id = Column(Integer, ForeignKey("proposal_sent.id"), nullable=True)
     client_id = Column(Integer, ForeignKey("clients.id"), nullable=True)
-    assigned_to = Column(String)
+    assigned_to = Column(String(100), index=True)
     event_type = Column(String)
     meeting_type = Column(String, nullable=True)
-    event_time = Column(DateTime)
+    event_time = Column(DateTime, index=True)
     event_end_time = Column(DateTime, nullable=True)
     created_by = Column(String)
     remark = Column(String)
-    phase = Column(String, default="Scheduled")
+    phase = Column(String(50), default="Scheduled")
     created_at = Column(DateTime, default=datetime.utcnow)
     lead = relationship("Lead", back_populates="events")
 
 class Reminder(Base):
     __tablename__ = "reminders"
+    # The reminder loop polls for status == "pending" and remind_time <= now.
+    # Filtered to pending rows: every hot read (the reminder loop, pending lists) filters
+    # on status = 'pending' and ranges or sorts by remind_time, and sent rows never match.
+    __table_args__ = (Index("ix_reminders_pending_time", "remind_time", mssql_where=text("status = 'pending'")),)
     id = Column(Integer, primary_key=True, index=True)
-    lead_id = Column(Integer, ForeignKey("leads.id"), nullable=True)
+    lead_id = Column(Integer, ForeignKey("leads.id"), nullable=True, index=True)
     proposal_id = Column(Integer, ForeignKey("proposal_sent.id"), nullable=True)
     client_id = Column(Integer, ForeignKey("clients.id"), nullable=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     remind_time = Column(DateTime)
     activity_type = Column(String, default="Follow-up")
     message = Column(String)
     assigned_to = Column(String)
-    status = Column(String, default="pending")
+    status = Column(String(50), default="pending")
     created_at = Column(DateTime, default=datetime.utcnow)
     is_hidden_from_activity_log = Column(Boolean, default=False)
     user = relationship("User", back_populates="reminders")
@@ -180,7 +201,7 @@ class Demo(Base):
     event_end_time = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    phase = Column(String, default="Scheduled")
+    phase = Column(String(50), default="Scheduled")
     remark = Column(Text, nullable=True)
     lead = relationship("Lead", back_populates="demos")
 
@@ -188,37 +209,37 @@ class ProposalSent(Base):
     __tablename__ = "proposal_sent"
     id = Column(Integer, primary_key=True, index=True)
     original_lead_id = Column(Integer, ForeignKey("leads.id"), nullable=False)
-    company_name = Column(String, nullable=False)
-    source = Column(String, nullable=False)
-    created_by = Column(String, nullable=False)
-    assigned_to = Column(String, nullable=False)
-    email = Column(String, nullable=True)
-    website = Column(String, nullable=True)
-    linkedIn = Column(String, nullable=True)
+    company_name = Column(String(255), nullable=False)
+    source = Column(String(100), nullable=False)
+    created_by = Column(String(100), nullable=False)
+    assigned_to = Column(String(100), nullable=False)
+    email = Column(String(254), nullable=True)
+    website = Column(String(512), nullable=True)
+    linkedIn = Column(String(512), nullable=True)
     address = Column(Text, nullable=True)
     address_2 = Column(Text, nullable=True)
-    city = Column(String, nullable=True)
-    state = Column(String, nullable=True)
-    pincode = Column(String, nullable=True)
-    country = Column(String, nullable=True)
-    segment = Column(String, nullable=True)
-    verticles = Column(String, nullable=True)
-    team_size = Column(String, nullable=True)
+    city = Column(String(100), nullable=True)
+    state = Column(String(100), nullable=True)
+    pincode = Column(String(20), nullable=True)
+    country = Column(String(100), nullable=True)
+    segment = Column(String(100), nullable=True)
+    verticles = Column(String(100), nullable=True)
+    team_size = Column(String(50), nullable=True)
     remark = Column(Text, nullable=True)
-    status = Column(String, default="Proposal Sent")
-    lead_type = Column(String, nullable=True)
-    phone_2 = Column(String, nullable=True)
-    turnover = Column(String, nullable=True)
-    current_system = Column(String, nullable=True)
+    status = Column(String(50), default="Proposal Sent")
+    lead_type = Column(String(50), nullable=True)
+    phone_2 = Column(String(50), nullable=True)
+    turnover = Column(String(100), nullable=True)
+    current_system = Column(String(255), nullable=True)
     machine_specification = Column(Text, nullable=True)
     challenges = Column(Text, nullable=True)
-    opportunity_business = Column(String, nullable=True)
+    opportunity_business = Column(String(255), nullable=True)
     target_closing_date = Column(Date, nullable=True)
-    version = Column(String, nullable=True)
-    database_type = Column(String, nullable=True)
-    amc = Column(String, nullable=True)
-    gst = Column(String, nullable=False)
-    company_pan = Column(String, nullable=True)
+    version = Column(String(50), nullable=True)
+    database_type = Column(String(100), nullable=True)
+    amc = Column(String(100), nullable=True)
+    gst = Column(String(50), nullable=False)
+    company_pan = Column(String(20), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     converted_at = Column(DateTime, default=datetime.utcnow)
@@ -233,12 +254,12 @@ class ProposalSentContact(Base):
     __tablename__ = "proposal_sent_contacts"
     id = Column(Integer, primary_key=True, index=True)
     proposal_id = Column(Integer, ForeignKey("proposal_sent.id"), nullable=False)
-    contact_name = Column(String, nullable=True)
-    phone = Column(String, nullable=True)
-    email = Column(String, nullable=True)
-    designation = Column(String, nullable=True)
-    linkedIn = Column(String, nullable=True)
-    pan = Column(String, nullable=True)
+    contact_name = Column(String(255), nullable=True)
+    phone = Column(String(50), nullable=True)
+    email = Column(String(254), nullable=True)
+    designation = Column(String(100), nullable=True)
+    linkedIn = Column(String(512), nullable=True)
+    pan = Column(String(20), nullable=True)
     proposal = relationship("ProposalSent", back_populates="contacts")
 
 class ProposalSentActivityLog(Base):
@@ -254,19 +275,20 @@ class ProposalSentActivityLog(Base):
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (Index("ix_tasks_assignee_status", "assigned_to", "status"),)
     id = Column(Integer, primary_key=True, index=True)
-    lead_id = Column(Integer, ForeignKey("leads.id"))
+    lead_id = Column(Integer, ForeignKey("leads.id"), index=True)
     task_type = Column(String)
     date_time = Column(DateTime)
-    assigned_to = Column(String)
+    assigned_to = Column(String(100))
     remark = Column(String)
-    status = Column(String, default="pending")
+    status = Column(String(50), default="pending")
     lead = relationship("Lead", back_populates="tasks")
 
 class TaskHistory(Base):
     __tablename__ = "task_history"
     id = Column(Integer, primary_key=True, index=True)
-    lead_id = Column(Integer, ForeignKey("leads.id"))
+    lead_id = Column(Integer, ForeignKey("leads.id"), index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     action = Column(String)
     details = Column(Text)
@@ -296,7 +318,7 @@ class Feedback(Base):
 class AssignmentLog(Base):
     __tablename__ = "AssignmentLogs"
     id = Column(Integer, primary_key=True, index=True)
-    lead_id = Column(Integer, ForeignKey("leads.id"))
+    lead_id = Column(Integer, ForeignKey("leads.id"), index=True)
     assigned_to = Column(String)
     assigned_by = Column(String)
     assigned_at = Column(DateTime, default=datetime.utcnow)
@@ -348,6 +370,7 @@ class LeadDripAssignment(Base):
 
 class SentDripMessageLog(Base):
     __tablename__ = "SentDripMessageLog"
+    __table_args__ = (Index("ix_sent_drip_assignment_step", "assignment_id", "step_id"),)
     id = Column(Integer, primary_key=True, index=True)
     assignment_id = Column(Integer, ForeignKey("LeadDripAssignment.id"), nullable=False)
     step_id = Column(Integer, ForeignKey("DripSequenceStep.id"), nullable=False)
@@ -358,28 +381,28 @@ class SentDripMessageLog(Base):
 class Client(Base):
     __tablename__ = "clients"
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    company_name = Column(String, nullable=False)
-    website = Column(String, nullable=True)
-    linkedIn = Column(String, nullable=True)
-    company_email = Column(String, nullable=True)
-    company_phone_2 = Column(String, nullable=True)
-    address = Column(String, nullable=True)
-    address_2 = Column(String, nullable=True)
-    city = Column(String, nullable=True)
-    state = Column(String, nullable=True)
-    pincode = Column(String, nullable=True)
-    country = Column(String, nullable=True)
-    segment = Column(String, nullable=True)
-    verticles = Column(String, nullable=True)
-    team_size = Column(String, nullable=True)
-    turnover = Column(String, nullable=True)
-    current_system = Column(String, nullable=True)
+    company_name = Column(String(255), nullable=False)
+    website = Column(String(512), nullable=True)
+    linkedIn = Column(String(512), nullable=True)
+    company_email = Column(String(254), nullable=True)
+    company_phone_2 = Column(String(50), nullable=True)
+    address = Column(String(500), nullable=True)
+    address_2 = Column(String(500), nullable=True)
+    city = Column(String(100), nullable=True)
+    state = Column(String(100), nullable=True)
+    pincode = Column(String(20), nullable=True)
+    country = Column(String(100), nullable=True)
+    segment = Column(String(100), nullable=True)
+    verticles = Column(String(100), nullable=True)
+    team_size = Column(String(50), nullable=True)
+    turnover = Column(String(100), nullable=True)
+    current_system = Column(String(255), nullable=True)
     machine_specification = Column(Text, nullable=True)
     challenges = Column(Text, nullable=True)
-    version = Column(String, nullable=True)
-    database_type = Column(String, nullable=True)
-    amc = Column(String, nullable=True)
-    gst = Column(String, nullable=True)
+    version = Column(String(50), nullable=True)
+    database_type = Column(String(100), nullable=True)
+    amc = Column(String(100), nullable=True)
+    gst = Column(String(50), nullable=True)
     converted_date = Column(Date, nullable=False, default=date.today)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -393,10 +416,10 @@ class ClientContact(Base):
     __tablename__ = "client_contacts"
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
-    contact_name = Column(String, nullable=True)
-    phone = Column(String, nullable=True)
-    email = Column(String, nullable=True)
-    designation = Column(String, nullable=True)
-    linkedIn = Column(String, nullable=True)
-    pan = Column(String, nullable=True)
+    contact_name = Column(String(255), nullable=True)
+    phone = Column(String(50), nullable=True)
+    email = Column(String(254), nullable=True)
+    designation = Column(String(100), nullable=True)
+    linkedIn = Column(String(512), nullable=True)
+    pan = Column(String(20), nullable=True)
     client = relationship("Client", back_populates="contacts")
\ No newline at end of file
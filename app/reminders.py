@@ -3,7 +3,7 @@ from datetime import datetime, date, time, timedelta
 from sqlalchemy.orm import Session
 from app.db import get_db_session_for_company, COMPANY_TO_ENV_MAP
 from app.models import Reminder, User, LeadDripAssignment
-from app.message_sender import send_whatsapp_message
+from app.message_sender import send_many, send_whatsapp_message_async
 from app.crud import get_active_drip_assignments, get_sent_step_ids_for_assignment, log_sent_drip_message
 import asyncio
 import logging
@@ -68,27 +68,33 @@ async def reminder_loop():
                 if due_reminders_with_users:
                     logger.info(f"   Found {len(due_reminders_with_users)} due reminders for '{company}'.")
 
+                sendable = []
                 for reminder, user in due_reminders_with_users:
-                    try:
-                        if not user.usernumber:
-                            logger.warning(f"   Skipping reminder ID {reminder.id} for '{company}' because user {user.username} has no phone number.")
-                            reminder.status = "failed"
-                            continue
-
-                        success = send_whatsapp_message(number=user.usernumber, message=f"⏰ Reminder: {reminder.message}")
-                        
-                        if success:
-                            reminder.status = "sent"
-                            logger.info(f"   ✅ Sent reminder ID {reminder.id} for '{company}' to {user.usernumber}")
-                        else:
-                            reminder.status = "failed"
-                            logger.error(f"   ❌ Failed to send reminder ID {reminder.id} for '{company}' via WhatsApp API.")
-
-                    except Exception as e:
+                    if not user.usernumber:
+                        logger.warning(f"   Skipping reminder ID {reminder.id} for '{company}' because user {user.username} has no phone number.")
                         reminder.status = "failed"
-                        logger.error(f"   ❌ Exception sending reminder ID {reminder.id} for '{company}': {e}", exc_info=True)
-                    finally:
-                        db.commit()
+                    else:
+                        sendable.append((reminder, user))
+
+                # Due reminders are sent concurrently rather than one blocking request at a time.
+                results = await send_many(
+                    [(user.usernumber, f"⏰ Reminder: {reminder.message}") for reminder, user in sendable],
+                    dedupe=True,
+                )
+
+                for (reminder, user), result in zip(sendable, results):
+                    if isinstance(result, Exception):
+                        reminder.status = "failed"
+                        logger.error(f"   ❌ Exception sending reminder ID {reminder.id} for '{company}': {result}", exc_info=result)
+                    elif result:
+                        reminder.status = "sent"
+                        logger.info(f"   ✅ Sent reminder ID {reminder.id} for '{company}' to {user.usernumber}")
+                    else:
+                        reminder.status = "failed"
+                        logger.error(f"   ❌ Failed to send reminder ID {reminder.id} for '{company}' via WhatsApp API.")
+
+                if due_reminders_with_users:
+                    db.commit()
 
             except Exception as outer_e:
                 logger.error(f"⚠️ An error occurred in the reminder loop for company '{company}': {outer_e}", exc_info=True)
@@ -114,7 +120,9 @@ async def drip_campaign_loop():
 
         for company in all_companies:
             logger.info(f"-> Checking drip campaigns for company: '{company}'")
-            db: Session = get_db_session_for_company(company)
+            # Each sent step is committed on its own; without expiry the eager-loaded
+            # assignments, leads and steps stay populated across those commits.
+            db: Session = get_db_session_for_company(company, expire_on_commit=False)
 
             try:
                 today = date.today()
@@ -148,7 +156,7 @@ async def drip_campaign_loop():
                                 
                                 primary_contact = assignment.lead.contacts[0] if assignment.lead.contacts else None
                                 if primary_contact and message_content:
-                                    success = send_whatsapp_message(
+                                    success = await send_whatsapp_message_async(
                                         number=primary_contact.phone,
                                         message=message_content
                                     )
@@ -1,5 +1,6 @@
 # app/temp_store.py
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+import threading
 import time
 
 class TempStore:
@@ -20,3 +21,69 @@ class TempStore:
         return val
 
 temp_store = TempStore()
+
+
+_MISSING = object()
+
+class ContextStore:
+    """
+    Bounded, thread-safe TTL store with a dict-like interface.
+    Every write gets the same TTL and moves the key to the end, so entries are
+    kept in expiry order: expired ones are swept from the front on each write,
+    and the oldest entry is evicted once maxsize is exceeded.
+    """
+    def __init__(self, maxsize=10000, ttl=1800):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict_expired(self, now):
+        while self._data:
+            _, (_, expires) = next(iter(self._data.items()))
+            if expires > now:
+                break
+            self._data.popitem(last=False)
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            now = time.time()
+            self._evict_expired(now)
+            self._data.pop(key, None)
+            self._data[key] = (value, now + self.ttl)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires = item
+            if time.time() > expires:
+                del self._data[key]
+                return default
+            return value
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+        if item is None or time.time() > item[1]:
+            return default
+        return item[0]
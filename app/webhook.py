@@ -43,7 +43,7 @@ from app.crud import (
     get_users,create_reminder, get_all_leads_with_last_activity,create_activity_log , update_lead_status, get_scheduled_demos,get_scheduled_meetings, get_all_meetings, get_all_demos, get_scheduled_meetings,
     create_activity_log, get_all_unified_activities, get_tasks_by_username,
     get_activities_by_lead_id, get_lead_history, get_all_leads, get_lead_by_id,
-    update_lead, save_lead, get_user_by_id, update_user, delete_user,
+    update_lead, save_lead, save_leads_bulk, get_user_by_id, update_user, delete_user,
     get_pending_reminders, create_event, complete_meeting, complete_demo,
     is_user_available, get_user_by_name, create_message, complete_scheduled_activity,
     get_all_messages, get_message_by_id, update_message, delete_message,
@@ -59,7 +59,7 @@ from app.crud import (
     convert_lead_to_proposal, get_all_proposals
     # --- END: NEW IMPORTS ---
 )
-from sqlalchemy.orm import Session,joinedload
+from sqlalchemy.orm import Session,joinedload,selectinload
 from app.db import get_db, get_db_session_for_company, COMPANY_TO_ENV_MAP
 from app.gpt_parser import parse_report_request, parse_intent_and_fields
 from app.crud import generate_user_performance_data
@@ -67,7 +67,7 @@ from app.report_generator import create_performance_report_pdf
 from app.handlers.message_router import route_message
 from app.gpt_parser import parse_datetime_from_text
 from datetime import datetime, timedelta, date
-from app.message_sender import send_whatsapp_message, send_whatsapp_message_with_media
+from app.message_sender import send_whatsapp_message, send_whatsapp_message_async, send_whatsapp_message_with_media, submit_whatsapp_message
 from app.crud import assign_drip_to_lead, log_sent_drip_message
 import asyncio
 from app.reminders import reminder_loop, drip_campaign_loop
@@ -231,34 +231,37 @@ async def handle_generate_report(msg_text: str, sender_phone: str):
         if not all([username, company_name, start_date, end_date]):
             error_msg = ("⚠️ Invalid format. Please use:\n\n"
                          "`Generate report of [username] for [company name] from [dd/mm/yy] to [dd/mm/yy]`")
-            send_whatsapp_message(number=sender_phone, message=error_msg)
+            await send_whatsapp_message_async(number=sender_phone, message=error_msg)
             return
 
         try:
             db_session = get_db_session_for_company(company_name)
         except HTTPException as e:
             logger.warning(f"Report generation failed for company '{company_name}': {e.detail}")
-            send_whatsapp_message(number=sender_phone, message=f"❌ {e.detail}")
+            await send_whatsapp_message_async(number=sender_phone, message=f"❌ {e.detail}")
             return
 
         user = get_user_by_name(db_session, username)
         if not user:
             error_msg = f"❌ User '{username}' not found in company '{company_name}'. Please check the name."
-            send_whatsapp_message(number=sender_phone, message=error_msg)
+            await send_whatsapp_message_async(number=sender_phone, message=error_msg)
             return
             
-        send_whatsapp_message(number=sender_phone, message=f"⏳ Generating report for *{user.username}* from company *{company_name}*... Please wait.")
+        await send_whatsapp_message_async(number=sender_phone, message=f"⏳ Generating report for *{user.username}* from company *{company_name}*... Please wait.")
 
         report_data = generate_user_performance_data(db_session, user.id, start_date, end_date)
         if not report_data:
             error_msg = "❌ Could not generate report data. An internal error occurred."
-            send_whatsapp_message(number=sender_phone, message=error_msg)
+            await send_whatsapp_message_async(number=sender_phone, message=error_msg)
             return
 
         pdf_file_path = create_performance_report_pdf(report_data, user.username, start_date, end_date, UPLOAD_DIRECTORY)
         
         message_text = f"📊 Here is the performance report for *{user.username}* from {start_date.strftime('%d/%m/%y')} to {end_date.strftime('%d/%m/%y')}."
-        success = send_whatsapp_message_with_media(
+        # The media sender is synchronous; run it in a worker thread so its retries
+        # do not stall the event loop.
+        success = await asyncio.to_thread(
+            send_whatsapp_message_with_media,
             number=sender_phone,
             file_path=pdf_file_path,
             caption=message_text,
@@ -266,11 +269,11 @@ async def handle_generate_report(msg_text: str, sender_phone: str):
         )
 
         if not success:
-            send_whatsapp_message(number=sender_phone, message="❌ Failed to send the PDF report.")
+            await send_whatsapp_message_async(number=sender_phone, message="❌ Failed to send the PDF report.")
 
     except Exception as e:
         logger.error(f"❌ Critical error in handle_generate_report: {e}", exc_info=True)
-        send_whatsapp_message(number=sender_phone, message="❌ An unexpected error occurred while generating your report.")
+        await send_whatsapp_message_async(number=sender_phone, message="❌ An unexpected error occurred while generating your report.")
     
     finally:
         if db_session:
@@ -284,7 +287,9 @@ async def handle_generate_report(msg_text: str, sender_phone: str):
             
 @main_router.get("/leads/{user_id}", response_model=list[LeadResponse], tags=["Leads & History"])
 async def get_leads_by_user_id(user_id: str, db: Session = Depends(get_db)):
-    leads = db.query(Lead).filter(Lead.assigned_to == user_id, Lead.isActive == True).all()
+    leads = db.query(Lead).options(
+        selectinload(Lead.contacts), selectinload(Lead.attachments)
+    ).filter(Lead.assigned_to == user_id, Lead.isActive == True).all()
     if not leads:
         raise HTTPException(status_code=404, detail="No leads found for this user")
     return leads
@@ -449,7 +454,7 @@ def create_lead_from_web(lead_data: LeadCreate, db: Session = Depends(get_db)):
                        f"📱 *Phone:* {contact_phone}\n"
                        f"Assigned By: {creator_name}")
             
-            send_whatsapp_message(number=assignee.usernumber, message=message)
+            submit_whatsapp_message(number=assignee.usernumber, message=message)
             logger.info(f"Sent new lead notification to {assignee.username} at {assignee.usernumber}")
 
         return created_lead
@@ -714,7 +719,7 @@ def schedule_meeting_from_web(meeting_data: MeetingScheduleWeb, db: Session = De
         time_formatted = start_time_local_aware.strftime('%A, %b %d at %I:%M %p')
         contact_name = parent.contacts[0].contact_name if parent.contacts else "N/A"
         message = (f"📢 *New Meeting Scheduled for You*\n\n🏢 *Company:* {parent.company_name}\n👤 *Contact:* {contact_name}\n🕒 *Time:* {time_formatted}\nScheduled By: {creator.username}")
-        send_whatsapp_message(number=assignee.usernumber, message=message)
+        submit_whatsapp_message(number=assignee.usernumber, message=message)
         logger.info(f"Sent new meeting notification to {assignee.username} at {assignee.usernumber}")
 
     time_formatted_reminder = start_time_local_aware.strftime('%A, %b %d at %I:%M %p')
@@ -794,7 +799,7 @@ def schedule_demo_from_web(demo_data: DemoScheduleWeb, db: Session = Depends(get
         time_formatted = start_time_local_aware.strftime('%A, %b %d at %I:%M %p')
         contact_name = parent.contacts[0].contact_name if parent.contacts else "N/A"
         message = (f"📢 *New Demo Scheduled for You*\n\n🏢 *Company:* {parent.company_name}\n👤 *Contact:* {contact_name}\n🕒 *Time:* {time_formatted}\nScheduled By: {creator.username}")
-        send_whatsapp_message(number=assignee.usernumber, message=message)
+        submit_whatsapp_message(number=assignee.usernumber, message=message)
         logger.info(f"Sent new demo notification to {assignee.username} at {assignee.usernumber}")
 
     time_formatted_reminder = start_time_local_aware.strftime('%A, %b %d at %I:%M %p')
@@ -984,6 +989,8 @@ def upload_leads_from_excel(
 ):
     success_count = 0
     errors = []
+    pending = []
+    assignees = {}
 
     if not file.filename.endswith(('.xlsx', '.xls')):
         raise HTTPException(status_code=400, detail="Invalid file type. Please upload an Excel file.")
@@ -1005,7 +1012,9 @@ def upload_leads_from_excel(
                 if not assignee_name:
                     raise ValueError("The required field 'assigned_to' is missing or empty.")
 
-                assignee_user = get_user_by_name(db, assignee_name)
+                if assignee_name not in assignees:
+                    assignees[assignee_name] = get_user_by_name(db, assignee_name)
+                assignee_user = assignees[assignee_name]
                 if not assignee_user:
                     raise ValueError(f"Assigned user '{assignee_name}' not found in the database.")
 
@@ -1054,22 +1063,38 @@ def upload_leads_from_excel(
                     remark=get_value(row, 'remark'),
                 )
 
-                saved_lead = save_lead(db, lead_data)
-
+                activity = None
                 activity_details = get_value(row, 'activity_details')
                 if activity_details:
-                    activity_type = get_value(row, 'activity_type') or 'Note'
-                    activity_payload = schemas.ActivityLogCreate(
-                        lead_id=saved_lead.id, details=activity_details,
-                        phase="new", activity_type=activity_type
-                    )
-                    create_activity_log(db, activity_payload)
+                    activity = (activity_details, get_value(row, 'activity_type') or 'Note')
 
-                success_count += 1
+                pending.append((index, lead_data, activity))
             except Exception as e:
-                db.rollback()
                 errors.append(f"Row {index + 2}: {str(e)}")
 
+        # --- START: Save all valid rows in one transaction ---
+        try:
+            save_leads_bulk(db, [(lead_data, activity) for _, lead_data, activity in pending])
+            success_count = len(pending)
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"⚠️ Bulk lead insert failed ({e}), retrying row by row")
+            for index, lead_data, activity in pending:
+                try:
+                    saved_lead = save_lead(db, lead_data)
+                    if activity:
+                        activity_details, activity_type = activity
+                        activity_payload = schemas.ActivityLogCreate(
+                            lead_id=saved_lead.id, details=activity_details,
+                            phase="new", activity_type=activity_type
+                        )
+                        create_activity_log(db, activity_payload)
+                    success_count += 1
+                except Exception as e:
+                    db.rollback()
+                    errors.append(f"Row {index + 2}: {str(e)}")
+        # --- END: Save all valid rows in one transaction ---
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing Excel file: {str(e)}")
 
@@ -1244,7 +1269,8 @@ async def export_leads_to_excel(
     if not lead_ids:
         raise HTTPException(status_code=400, detail="No lead IDs provided for export.")
 
-    leads_to_export = db.query(models.Lead).filter(models.Lead.id.in_(lead_ids)).all()
+    # Contacts are loaded for all leads in one extra query rather than one per lead.
+    leads_to_export = db.query(models.Lead).options(selectinload(models.Lead.contacts)).filter(models.Lead.id.in_(lead_ids)).all()
 
     if not leads_to_export:
         raise HTTPException(status_code=404, detail="None of the provided lead IDs were found.")
@@ -3,7 +3,7 @@
 from fastapi import APIRouter, Request, FastAPI
 from fastapi.staticfiles import StaticFiles
 from app.gpt_parser import parse_lead_info
-from app.message_sender import send_whatsapp_message
+from app.message_sender import send_whatsapp_message, close_async_client, whatsify_circuit
 from app.crud import save_lead, update_lead_status
 from app.schemas import LeadCreate
 from app.reminders import reminder_loop, drip_campaign_loop
@@ -104,12 +104,24 @@ async def startup_event():
     logger.info("✅ Startup complete.")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Closes the shared HTTP client used for outgoing WhatsApp messages."""
+    await close_async_client()
+
+
 @app.get("/ping", tags=["Health"])
 async def ping():
     """A simple endpoint to check if the API is alive."""
     return {"status": "✅ API is alive"}
 
 
+@app.get("/health/whatsapp", tags=["Health"])
+async def whatsapp_health():
+    """Reports the Whatsify circuit breaker state ("closed" is healthy) for alerting."""
+    return {"circuit": whatsify_circuit.state, "consecutive_failures": whatsify_circuit.failures}
+
+
 
 
 def extract_company_name(text: str) -> str: